@@ -1,7 +1,15 @@
 # This file initializes the FastAPI app and will be used to include routers and services
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.init_db import create_tables, create_directories
+from app.database import async_engine
+from app.init_db import create_tables, create_directories, sweep_pdf_store
+from app.services.render_engine import get_render_engine, shutdown_render_engine
+from app.services.email_outbox import get_email_dispatcher, shutdown_email_dispatcher
+from app.services.email_log_buffer import shutdown_email_log_buffer
+from app.services.campaign_runner import get_campaign_runner, shutdown_campaign_runner
+from app.services.user_import import shutdown_hash_pool
+from send_mail import close_smtp_pool, close_async_smtp_engine
+from app.utils.asset_fetcher import preload_assets
 
 def create_app():
     app = FastAPI(
@@ -17,6 +25,7 @@ def create_app():
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "X-Total-Count", "X-Total-Count-Exact"],
     )
     
     # Initialize database and directories on startup
@@ -24,16 +33,29 @@ def create_app():
     async def startup_event():
         create_directories()
         create_tables()
+        sweep_pdf_store()
+        preload_assets()
+        get_render_engine().start()
+        await get_email_dispatcher().start()
+        await get_campaign_runner().resume_all()
+    
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        await shutdown_campaign_runner()
+        await shutdown_email_dispatcher()
+        shutdown_email_log_buffer()
+        shutdown_render_engine()
+        shutdown_hash_pool()
+        close_smtp_pool()
+        await close_async_smtp_engine()
+        await async_engine.dispose()
     
     # Include routers
-    from .routes import auth, admin
+    from .routes import auth, admin, letters, user
     app.include_router(auth.router, prefix="/api/auth", tags=["authentication"])
     app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
-    
-    # Additional routers to be implemented
-    # from .routes import user, letters
-    # app.include_router(user.router, prefix="/api/user", tags=["user"])
-    # app.include_router(letters.router, prefix="/api/letters", tags=["letters"])
+    app.include_router(letters.router, prefix="/api/letters", tags=["letters"])
+    app.include_router(user.router, prefix="/api/user", tags=["user"])
     
     @app.get("/")
     async def root():
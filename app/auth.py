@@ -4,9 +4,11 @@ from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.models.user import User
 from app.schemas import TokenData
 from config import Config
@@ -30,6 +32,10 @@ def get_password_hash(password: str) -> str:
     """Hash a password"""
     return pwd_context.hash(password)
 
+def hash_passwords(passwords):
+    """Hash a list of passwords; module-level so a process pool can run it"""
+    return [pwd_context.hash(password) for password in passwords]
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -54,18 +60,20 @@ def verify_token(token: str, credentials_exception):
         raise credentials_exception
     return token_data
 
-def authenticate_user(db: Session, username: str, password: str):
+async def authenticate_user(db: AsyncSession, username: str, password: str):
     """Authenticate user with username and password"""
-    user = db.query(User).filter(User.username == username).first()
+    result = await db.execute(select(User).where(User.username == username))
+    user = result.scalars().first()
     if not user:
         return False
-    if not verify_password(password, user.password_hash):
+    # bcrypt is deliberately slow; keep it off the event loop
+    if not await run_in_threadpool(verify_password, password, user.password_hash):
         return False
     return user
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get current authenticated user"""
     credentials_exception = HTTPException(
@@ -76,7 +84,8 @@ async def get_current_user(
     
     token = credentials.credentials
     token_data = verify_token(token, credentials_exception)
-    user = db.query(User).filter(User.username == token_data.username).first()
+    result = await db.execute(select(User).where(User.username == token_data.username))
+    user = result.scalars().first()
     if user is None:
         raise credentials_exception
     return user
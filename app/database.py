@@ -1,14 +1,92 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from config import Config
 
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune every new SQLite connection: WAL journaling, relaxed fsync, busy timeout and caches"""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={Config.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={Config.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(Config.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA cache_size=-{int(Config.SQLITE_CACHE_SIZE_KB)}")
+        cursor.execute(f"PRAGMA mmap_size={int(Config.SQLITE_MMAP_SIZE)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+# Async drivers used for each backend when DATABASE_URL names no driver
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg"
+}
+
+def _engine_options(url, is_async=False):
+    """Build create_engine keyword arguments shared by the sync and async engines"""
+    kwargs = {}
+    
+    if url.get_backend_name() == "sqlite":
+        kwargs["connect_args"] = {"timeout": Config.SQLITE_BUSY_TIMEOUT_MS / 1000}
+        if not is_async:
+            # Sessions are used from the threadpool, so connections move between threads
+            kwargs["connect_args"]["check_same_thread"] = False
+        in_memory = url.database in (None, "", ":memory:")
+    else:
+        kwargs["pool_pre_ping"] = True
+        kwargs["pool_recycle"] = Config.DB_POOL_RECYCLE
+        in_memory = False
+    
+    if not in_memory:
+        kwargs["pool_size"] = Config.DB_POOL_SIZE
+        kwargs["max_overflow"] = Config.DB_MAX_OVERFLOW
+        kwargs["pool_timeout"] = Config.DB_POOL_TIMEOUT
+    return kwargs
+
+def create_database_engine(database_url=None):
+    """
+    Create the SQLAlchemy engine for DATABASE_URL
+    
+    SQLite connections get the pragmas from _set_sqlite_pragmas; other
+    databases (e.g. PostgreSQL) get a pre-pinged, recycled connection pool.
+    Pool sizing comes from Config for both.
+    """
+    url = make_url(database_url or Config.DATABASE_URL)
+    engine = create_engine(url, **_engine_options(url))
+    if url.get_backend_name() == "sqlite":
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+def async_database_url(database_url=None):
+    """Map DATABASE_URL onto its asyncio driver (sqlite -> aiosqlite, postgresql -> asyncpg)"""
+    url = make_url(database_url or Config.DATABASE_URL)
+    backend = url.get_backend_name()
+    if url.get_driver_name() != ASYNC_DRIVERS.get(backend, url.get_driver_name()):
+        url = url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+    return url
+
+def create_async_database_engine(database_url=None):
+    """Create the asyncio engine for DATABASE_URL with the same pragmas and pool settings"""
+    url = async_database_url(database_url)
+    engine = create_async_engine(url, **_engine_options(url, is_async=True))
+    if url.get_backend_name() == "sqlite":
+        event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return engine
+
 # Create database engine
-engine = create_engine(Config.DATABASE_URL, connect_args={"check_same_thread": False})
+engine = create_database_engine()
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine and session factory for async route handlers; objects stay
+# loaded after commit so responses never trigger lazy loads outside a greenlet
+async_engine = create_async_database_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False,
+                                       expire_on_commit=False)
+
 # Create Base class
 Base = declarative_base()
 
@@ -19,3 +97,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependency to get an async database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,11 +1,12 @@
 # Database initialization script
-from app.database import engine
-from app.models import Base
+from app.migrations import run_migrations
+from app.database import SessionLocal
+from app.utils.pdf_store import PDFStore
 import os
 
 def create_tables():
-    """Create all database tables"""
-    Base.metadata.create_all(bind=engine)
+    """Create or upgrade all database tables by applying pending migrations"""
+    run_migrations()
     print("Database tables created successfully!")
 
 def create_directories():
@@ -21,6 +22,16 @@ def create_directories():
             os.makedirs(directory)
             print(f"Created directory: {directory}")
 
+def sweep_pdf_store():
+    """Remove stored letter PDFs that no letter references any more"""
+    db = SessionLocal()
+    try:
+        removed = PDFStore().sweep(db)
+    finally:
+        db.close()
+    if removed:
+        print(f"Removed {removed} unreferenced letter PDFs")
+
 if __name__ == "__main__":
     create_directories()
     create_tables()
@@ -0,0 +1,132 @@
+# Versioned schema migrations applied at startup
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateIndex
+from app.database import engine as default_engine
+from app.models import Base, GeneratedLetter, EmailLog, StatCounter, DailyStat
+from app.services.stats import rebuild_stats
+from app.services.letter_generator import normalize_letter_fields
+from app.utils.json_fields import json_field
+
+# Applied migrations are recorded here, one row per version
+migration_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False)
+)
+
+def _create_indexes(connection, table, names):
+    """Create the named indexes of a model table if they do not exist yet"""
+    indexes = {index.name: index for index in table.indexes}
+    for name in names:
+        # IF NOT EXISTS also covers expression indexes, which reflection does not report
+        connection.execute(CreateIndex(indexes[name], if_not_exists=True))
+
+def _create_base_tables(connection):
+    # A new database gets the current schema in one step; the migrations
+    # after this one then find their changes already present
+    Base.metadata.create_all(bind=connection)
+
+def _add_query_indexes(connection):
+    _create_indexes(connection, GeneratedLetter.__table__, [
+        "ix_generated_letters_generated_at_id",
+        "ix_generated_letters_user_id_generated_at",
+        "ix_generated_letters_status_generated_at",
+        "ix_generated_letters_letter_type_generated_at"
+    ])
+    _create_indexes(connection, EmailLog.__table__, ["ix_email_logs_letter_id_sent_at"])
+
+def _add_dashboard_stats(connection):
+    Base.metadata.create_all(bind=connection, tables=[StatCounter.__table__, DailyStat.__table__])
+    rebuild_stats(connection)
+
+def _letter_data_as_json(connection):
+    letters = GeneratedLetter.__table__
+    if connection.dialect.name == "postgresql":
+        columns = {column["name"]: column for column in inspect(connection).get_columns("generated_letters")}
+        if columns["letter_data"]["type"].__class__.__name__ != "JSONB":
+            connection.exec_driver_sql(
+                "ALTER TABLE generated_letters ALTER COLUMN letter_data TYPE JSONB USING letter_data::jsonb"
+            )
+    
+    # Salaries saved as text ("85,000") become numbers and start dates saved
+    # as free text ("January 15, 2024") ISO dates, so range filters see them
+    salary_text = json_field(letters.c.letter_data, "salary")
+    salary_number = json_field(letters.c.letter_data, "salary", numeric=True)
+    start_date = json_field(letters.c.letter_data, "start_date")
+    rows = connection.execute(
+        select(letters.c.id, letters.c.letter_data).where(or_(
+            salary_text.is_not(None) & salary_number.is_(None),
+            start_date.is_not(None) & start_date.not_like("____-__-__")
+        ))
+    ).all()
+    for letter_id, letter_data in rows:
+        normalized = normalize_letter_fields(dict(letter_data))
+        if normalized != letter_data:
+            connection.execute(update(letters).where(letters.c.id == letter_id).values(letter_data=normalized))
+    
+    _create_indexes(connection, letters, [
+        "ix_generated_letters_data_position",
+        "ix_generated_letters_data_department",
+        "ix_generated_letters_data_salary",
+        "ix_generated_letters_data_start_date"
+    ])
+
+# (version, description, function) in the order they are applied. Append new
+# migrations at the end and never change one that has shipped. Each must
+# tolerate its change already being present, since a new database is created
+# from the current models by the first one.
+MIGRATIONS = [
+    (1, "Create base tables", _create_base_tables),
+    (2, "Add query indexes for letters and email logs", _add_query_indexes),
+    (3, "Add dashboard counters and daily rollups", _add_dashboard_stats),
+    (4, "Store letter_data as JSON with indexes on its common fields", _letter_data_as_json)
+]
+
+def applied_versions(connection):
+    """Get the set of migration versions recorded in the database"""
+    return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+def run_migrations(bind=None):
+    """
+    Apply every migration the database has not recorded yet
+    
+    Each migration runs in its own transaction and is recorded only once it
+    has succeeded, so a failed migration is retried on the next start. If
+    several processes start at once, the one that records a version second
+    rolls back and moves on.
+    
+    Args:
+        bind: Engine to migrate (defaults to the application engine)
+    
+    Returns:
+        List of the versions applied
+    """
+    bind = bind or default_engine
+    migration_metadata.create_all(bind=bind)
+    
+    with bind.connect() as connection:
+        done = applied_versions(connection)
+    
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        if version in done:
+            continue
+        try:
+            with bind.begin() as connection:
+                migrate(connection)
+                connection.execute(schema_migrations.insert().values(
+                    version=version,
+                    description=description,
+                    applied_at=datetime.utcnow()
+                ))
+        except IntegrityError:
+            # Another process recorded this version first
+            continue
+        applied.append(version)
+        print(f"Applied migration {version}: {description}")
+    return applied
@@ -3,8 +3,11 @@ from .user import User
 from .letter import GeneratedLetter
 from .template import LetterTemplate
 from .email_log import EmailLog
+from .email_outbox import EmailOutbox
+from .campaign import LetterCampaign
+from .stats import StatCounter, DailyStat
 
 # Import Base for database initialization
 from app.database import Base
 
-__all__ = ["User", "GeneratedLetter", "LetterTemplate", "EmailLog", "Base"]
+__all__ = ["User", "GeneratedLetter", "LetterTemplate", "EmailLog", "EmailOutbox", "LetterCampaign", "StatCounter", "DailyStat", "Base"]
@@ -0,0 +1,28 @@
+# Campaign model for letters generated for every user matching a filter
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, func
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+class LetterCampaign(Base):
+    __tablename__ = "letter_campaigns"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100))
+    letter_type = Column(String(50), nullable=False)
+    filters = Column(Text)  # JSON data as text
+    letter_data = Column(Text)  # JSON data as text
+    send_email = Column(Boolean, default=True)
+    status = Column(String(20), default="pending", index=True)  # pending, running, completed, failed, cancelled
+    total = Column(Integer, default=0)
+    skipped = Column(Integer, default=0)
+    generated = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    last_user_id = Column(Integer, default=0)  # Users up to this id have their letter
+    last_error = Column(Text)
+    created_by = Column(Integer, ForeignKey("users.id"))
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    completed_at = Column(DateTime)
+    
+    # Relationships
+    creator = relationship("User")
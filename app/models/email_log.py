@@ -1,5 +1,5 @@
 # Email log model for tracking sent emails
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, func
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index, func
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -16,3 +16,8 @@ class EmailLog(Base):
     
     # Relationships
     letter = relationship("GeneratedLetter", back_populates="email_logs")
+    
+    __table_args__ = (
+        # Email history of a letter
+        Index("ix_email_logs_letter_id_sent_at", "letter_id", "sent_at"),
+    )
@@ -0,0 +1,24 @@
+# Outbox model for emails waiting to be delivered by the background workers
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, func
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    recipient_email = Column(String(100), nullable=False)
+    subject = Column(String(255), nullable=False)
+    body = Column(Text)  # Cleared once delivered or dead-lettered
+    attachment_path = Column(String(255))
+    attachment_name = Column(String(255))
+    letter_id = Column(Integer, ForeignKey("generated_letters.id"))
+    status = Column(String(20), default="pending", index=True)  # pending, sending, sent, dead
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=func.now(), index=True)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=func.now())
+    sent_at = Column(DateTime)
+    
+    # Relationships
+    letter = relationship("GeneratedLetter")
@@ -1,7 +1,9 @@
 # Letter model for generated letters
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, func
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, JSON, func
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from app.database import Base
+from app.utils.json_fields import json_field
 
 class GeneratedLetter(Base):
     __tablename__ = "generated_letters"
@@ -9,7 +11,7 @@ class GeneratedLetter(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     letter_type = Column(String(50), nullable=False)
-    letter_data = Column(Text)  # JSON data as text
+    letter_data = Column(JSON().with_variant(JSONB(), "postgresql"))  # Letter fields, see stored_letter_data
     pdf_path = Column(String(255))
     status = Column(String(20), default="generated")
     generated_by = Column(Integer, ForeignKey("users.id"))
@@ -21,3 +23,17 @@ class GeneratedLetter(Base):
     user = relationship("User", foreign_keys=[user_id], back_populates="generated_letters")
     generator = relationship("User", foreign_keys=[generated_by], back_populates="created_letters")
     email_logs = relationship("EmailLog", back_populates="letter")
+    
+    __table_args__ = (
+        # Keyset pagination of the admin letter listing, newest first
+        Index("ix_generated_letters_generated_at_id", "generated_at", "id"),
+        # Listings filtered by employee, status or letter type, newest first
+        Index("ix_generated_letters_user_id_generated_at", "user_id", "generated_at"),
+        Index("ix_generated_letters_status_generated_at", "status", "generated_at"),
+        Index("ix_generated_letters_letter_type_generated_at", "letter_type", "generated_at"),
+        # Letter listing filters on fields inside letter_data
+        Index("ix_generated_letters_data_position", json_field(letter_data, "position")),
+        Index("ix_generated_letters_data_department", json_field(letter_data, "department")),
+        Index("ix_generated_letters_data_salary", json_field(letter_data, "salary", numeric=True)),
+        Index("ix_generated_letters_data_start_date", json_field(letter_data, "start_date")),
+    )
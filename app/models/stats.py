@@ -0,0 +1,16 @@
+# Dashboard counters and daily rollups, maintained as letters, users and emails are written
+from sqlalchemy import Column, Integer, String, Date
+from app.database import Base
+
+class StatCounter(Base):
+    __tablename__ = "stat_counters"
+    
+    name = Column(String(100), primary_key=True)  # e.g. letters, letters.type.offer_letter, emails.sent
+    value = Column(Integer, nullable=False, default=0)
+
+class DailyStat(Base):
+    __tablename__ = "daily_stats"
+    
+    day = Column(Date, primary_key=True)
+    metric = Column(String(100), primary_key=True)  # Same names as StatCounter
+    value = Column(Integer, nullable=False, default=0)
@@ -1,32 +1,75 @@
 # Admin routes for user management and letter generation
+import asyncio
+import json
+from datetime import date, datetime, time, timedelta
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db, SessionLocal
 from app.models.user import User
 from app.models.letter import GeneratedLetter
 from app.models.template import LetterTemplate
+from app.models.campaign import LetterCampaign
+from app.models.email_log import EmailLog
+from app.models.email_outbox import EmailOutbox
 from app.schemas import (
     UserResponse, UserCreate, UserUpdate,
-    LetterResponse, LetterCreate,
+    LetterResponse, LetterCreate, LetterBatchCreate,
+    LetterCampaignCreate, LetterCampaignResponse,
     TemplateResponse, TemplateCreate
 )
 from app.auth import get_admin_user, get_password_hash
 from app.services.email_service import EmailService
-from app.services.letter_generator import LetterGenerator
+from app.services.email_outbox import get_email_dispatcher, prime_attachment
+from app.services.letter_generator import LetterGenerator, build_letter_data, stored_letter_data
+from app.services.render_engine import RenderQueueFull
+from app.services.batch_generator import BatchLetterGenerator
+from app.services.campaign_runner import create_campaign, get_campaign_runner
+from app.services import stats as dashboard_stats
+from app.services.user_import import IMPORT_FORMATS, UserImporter, format_from_content_type
+from app.utils.pdf_store import PDFStore
+from app.utils.pagination import InvalidCursor, estimate_count, fetch_page, set_page_headers
+from app.utils.json_fields import json_field
+from app.utils.zip_stream import stream_zip
 
 router = APIRouter()
 
 # User Management Endpoints
 @router.get("/users", response_model=List[UserResponse])
 async def get_all_users(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    department: Optional[str] = None,
+    role: Optional[str] = None,
     current_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all users (admin only)"""
-    users = db.query(User).offset(skip).limit(limit).all()
+    """
+    Get users in id order, one page at a time (admin only)
+    
+    Pass the X-Next-Cursor header of a page as cursor to get the next one.
+    The first page also carries X-Total-Count (see X-Total-Count-Exact).
+    """
+    query = select(User)
+    if department:
+        query = query.where(User.department == department)
+    if role:
+        query = query.where(User.role == role)
+    
+    try:
+        users, next_cursor = await fetch_page(db, query, [User.id], "users", limit, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    total = None if cursor else await estimate_count(db, query, User.__table__)
+    set_page_headers(response, next_cursor, total)
     return users
 
 @router.post("/users", response_model=UserResponse)
@@ -35,13 +78,14 @@ async def create_user(
     send_email: bool = True,
     generate_welcome_letter: Optional[str] = None,
     current_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new user (admin only)"""
     # Check if user already exists
-    db_user = db.query(User).filter(
+    result = await db.execute(select(User).where(
         (User.username == user.username) | (User.email == user.email)
-    ).first()
+    ))
+    db_user = result.scalars().first()
     
     if db_user:
         raise HTTPException(
@@ -53,7 +97,7 @@ async def create_user(
     plain_password = user.password
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await run_in_threadpool(get_password_hash, user.password)
     db_user = User(
         username=user.username,
         email=user.email,
@@ -67,13 +111,15 @@ async def create_user(
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
-    # Send email with credentials and optional welcome letter
+    # Queue the credentials email, with the optional welcome letter, in the outbox
     if send_email:
         email_service = EmailService(db)
         letter_pdf_path = None
+        letter_id = None
+        store_write = None
         
         # Generate welcome letter if requested
         if generate_welcome_letter:
@@ -90,50 +136,91 @@ async def create_user(
                     'joining_date': db_user.joining_date.strftime("%B %d, %Y") if db_user.joining_date else None
                 }
                 
-                letter_pdf_path = letter_generator.generate_letter(generate_welcome_letter, user_data)
+                rendered = await letter_generator.render_letter_async(generate_welcome_letter, user_data)
+                if not rendered.stored:
+                    # Write the PDF to storage while the letter row is inserted
+                    store_write = asyncio.create_task(
+                        PDFStore().write_bytes_async(rendered.digest, rendered.pdf_data)
+                    )
                 
                 # Create letter record in database
-                if letter_pdf_path:
-                    db_letter = GeneratedLetter(
-                        user_id=db_user.id,
-                        letter_type=generate_welcome_letter,
-                        letter_data=user_data,
-                        generated_by=current_user.id,
-                        status="generated",
-                        pdf_path=letter_pdf_path
-                    )
-                    db.add(db_letter)
-                    db.commit()
-                    
+                db_letter = GeneratedLetter(
+                    user_id=db_user.id,
+                    letter_type=generate_welcome_letter,
+                    letter_data=stored_letter_data(user_data),
+                    generated_by=current_user.id,
+                    status="generated",
+                    pdf_path=rendered.pdf_path
+                )
+                db.add(db_letter)
+                await db.flush()
+                
+                if store_write is not None:
+                    await store_write
+                    await prime_attachment(rendered.pdf_path, rendered.pdf_data)
+                letter_pdf_path = rendered.pdf_path
+                letter_id = db_letter.id
+            
             except Exception as e:
+                await db.rollback()
+                await db.refresh(db_user)
                 print(f"Error generating welcome letter: {e}")
         
-        # Send credentials email
+        # The email is committed together with the letter row and sent by the email workers
         try:
-            email_success = email_service.send_user_credentials(
+            email_service.queue_user_credentials(
                 db_user.email,
                 db_user.username,
                 plain_password,
                 db_user.full_name,
-                letter_pdf_path
+                letter_pdf_path,
+                generate_welcome_letter if letter_id else None,
+                letter_id
             )
-            
-            if not email_success:
-                print(f"Failed to send credentials email to {db_user.email}")
-                
+            await db.commit()
+            get_email_dispatcher().notify()
         except Exception as e:
-            print(f"Error sending credentials email: {e}")
+            await db.rollback()
+            await db.refresh(db_user)
+            print(f"Error queueing credentials email: {e}")
     
     return db_user
 
+@router.post("/users/import")
+async def import_users(
+    request: Request,
+    file_format: Optional[str] = None,
+    send_email: bool = True,
+    generate_welcome_letter: Optional[str] = None,
+    current_user: User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Create users in bulk from a CSV or JSON Lines upload (admin only)
+    
+    The request body is the file itself: CSV with a header row naming the
+    user fields, or one JSON object per line. The format is taken from
+    file_format, or else from the Content-Type. Rows are imported in batches
+    as the body streams in, and the response reports the outcome of each.
+    """
+    file_format = file_format or format_from_content_type(request.headers.get("content-type"))
+    if file_format not in IMPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Upload CSV (text/csv) or JSON Lines (application/x-ndjson), or set file_format"
+        )
+    
+    importer = UserImporter(db, current_user.id, send_email, generate_welcome_letter)
+    return await importer.run(request.stream(), file_format)
+
 @router.get("/users/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: int,
     current_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get user by ID (admin only)"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -146,10 +233,10 @@ async def update_user(
     user_id: int,
     user_update: UserUpdate,
     current_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update user (admin only)"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -161,38 +248,94 @@ async def update_user(
     for field, value in update_data.items():
         setattr(user, field, value)
     
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 @router.delete("/users/{user_id}")
 async def delete_user(
     user_id: int,
     current_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete user (admin only)"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
     return {"message": "User deleted successfully"}
 
 # Letter Management Endpoints
 @router.get("/letters", response_model=List[LetterResponse])
 async def get_all_letters(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    letter_type: Optional[str] = None,
+    letter_status: Optional[str] = Query(None, alias="status"),
+    user_id: Optional[int] = None,
+    department: Optional[str] = None,
+    position: Optional[str] = None,
+    letter_department: Optional[str] = None,
+    salary_min: Optional[float] = None,
+    salary_max: Optional[float] = None,
+    start_date_from: Optional[date] = None,
+    start_date_to: Optional[date] = None,
     current_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all generated letters (admin only)"""
-    letters = db.query(GeneratedLetter).offset(skip).limit(limit).all()
+    """
+    Get generated letters, newest first, one page at a time (admin only)
+    
+    department filters on the employee's current department; position,
+    letter_department, salary_min/salary_max and start_date_from/start_date_to
+    filter on the fields stored in the letter's letter_data, using their
+    expression indexes.
+    
+    Pages are keyed on (generated_at, id), so they stay stable while new
+    letters are inserted. Pass the X-Next-Cursor header of a page as cursor
+    to get the next one. The first page also carries X-Total-Count.
+    """
+    query = select(GeneratedLetter)
+    if letter_type:
+        query = query.where(GeneratedLetter.letter_type == letter_type)
+    if letter_status:
+        query = query.where(GeneratedLetter.status == letter_status)
+    if user_id is not None:
+        query = query.where(GeneratedLetter.user_id == user_id)
+    if department:
+        query = query.join(User, GeneratedLetter.user_id == User.id).where(User.department == department)
+    if position:
+        query = query.where(json_field(GeneratedLetter.letter_data, "position") == position)
+    if letter_department:
+        query = query.where(json_field(GeneratedLetter.letter_data, "department") == letter_department)
+    if salary_min is not None:
+        query = query.where(json_field(GeneratedLetter.letter_data, "salary", numeric=True) >= salary_min)
+    if salary_max is not None:
+        query = query.where(json_field(GeneratedLetter.letter_data, "salary", numeric=True) <= salary_max)
+    if start_date_from:
+        query = query.where(json_field(GeneratedLetter.letter_data, "start_date") >= start_date_from.isoformat())
+    if start_date_to:
+        query = query.where(json_field(GeneratedLetter.letter_data, "start_date") <= start_date_to.isoformat())
+    
+    try:
+        letters, next_cursor = await fetch_page(
+            db, query, [GeneratedLetter.generated_at, GeneratedLetter.id], "letters", limit, cursor,
+            descending=True
+        )
+    except InvalidCursor as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    total = None if cursor else await estimate_count(db, query, GeneratedLetter.__table__)
+    set_page_headers(response, next_cursor, total)
     return letters
 
 @router.post("/letters/generate", response_model=LetterResponse)
@@ -200,114 +343,378 @@ async def generate_letter(
     letter: LetterCreate,
     send_email: bool = True,
     current_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Generate a new letter (admin only)"""
     # Check if user exists
-    user = db.query(User).filter(User.id == letter.user_id).first()
+    user = await db.get(User, letter.user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    # Generate PDF letter
-    letter_pdf_path = None
+    # Render PDF letter in memory
     try:
         letter_generator = LetterGenerator()
         
         # Prepare user data for letter generation
-        user_data = {
-            'user_id': user.id,
-            'full_name': user.full_name,
-            'username': user.username,
-            'email': user.email,
-            'employee_id': user.employee_id,
-            'department': user.department,
-            'designation': user.designation,
-            'joining_date': user.joining_date.strftime("%B %d, %Y") if user.joining_date else None
-        }
-        
-        # Add any additional data from the request
-        if letter.letter_data:
-            user_data.update(letter.letter_data)
-        
-        # Override with specific fields from the request
-        if letter.department:
-            user_data['department'] = letter.department
-        if letter.position:
-            user_data['position'] = letter.position
-        if letter.salary:
-            user_data['salary'] = letter.salary
-        if letter.start_date:
-            user_data['start_date'] = letter.start_date
-        if letter.manager:
-            user_data['manager'] = letter.manager
-        if letter.end_date:
-            user_data['end_date'] = letter.end_date
-        if letter.reason:
-            user_data['reason'] = letter.reason
-        
-        # Generate the PDF
-        letter_pdf_path = letter_generator.generate_letter(letter.letter_type, user_data)
+        user_data = build_letter_data(user, letter)
         
+        # Render the PDF on the render engine
+        rendered = await letter_generator.render_letter_async(letter.letter_type, user_data)
+    
+    except RenderQueueFull as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error generating letter PDF: {str(e)}"
         )
     
+    # Write a newly rendered PDF to storage while the letter is recorded
+    store_write = None
+    if not rendered.stored:
+        store_write = asyncio.create_task(PDFStore().write_bytes_async(rendered.digest, rendered.pdf_data))
+    
     # Create letter record
     db_letter = GeneratedLetter(
         user_id=letter.user_id,
         letter_type=letter.letter_type,
-        letter_data=letter.letter_data,
+        letter_data=stored_letter_data(user_data, letter.letter_data),
         generated_by=current_user.id,
         status="generated",
-        pdf_path=letter_pdf_path
+        pdf_path=rendered.pdf_path
     )
-    
     db.add(db_letter)
-    db.commit()
-    db.refresh(db_letter)
+    await db.flush()
+    
+    # Queue the email with the letter in the same transaction; the email workers mark it sent
+    if send_email:
+        EmailService(db).queue_letter_notification(
+            user.email,
+            letter.letter_type,
+            rendered.pdf_path,
+            db_letter.id
+        )
     
-    # Send email with generated letter
-    if send_email and letter_pdf_path:
+    if store_write is not None:
         try:
-            email_service = EmailService(db)
-            email_success = email_service.send_letter_notification(
-                user.email,
-                letter.letter_type,
-                letter_pdf_path
-            )
-            
-            if email_success:
-                # Update letter status to indicate it was emailed
-                db_letter.status = "sent"
-                db.commit()
-            else:
-                print(f"Failed to send letter email to {user.email}")
-                
+            await store_write
         except Exception as e:
-            print(f"Error sending letter email: {e}")
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error saving letter PDF: {str(e)}"
+            )
+        if send_email:
+            await prime_attachment(rendered.pdf_path, rendered.pdf_data)
+    
+    await db.commit()
+    await db.refresh(db_letter)
+    if send_email:
+        get_email_dispatcher().notify()
     
     return db_letter
 
+@router.post("/letters/generate/batch")
+async def generate_letters_batch(
+    batch: LetterBatchCreate,
+    stream_format: str = "ndjson",
+    current_user: User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Generate letters for many users in one request (admin only)
+    
+    Accepts either an explicit list of letters or a user filter (department,
+    joining date range; at least one is required) with a letter type.
+    Progress is streamed back as one event per letter, as NDJSON (default)
+    or server-sent events.
+    """
+    if stream_format not in ("ndjson", "sse"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="stream_format must be 'ndjson' or 'sse'"
+        )
+    if (batch.letters is None) == (batch.filter is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide either a list of letters or a user filter"
+        )
+    
+    # Load every user for the batch in a single query
+    if batch.filter is not None:
+        if not batch.letter_type:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="letter_type is required when generating by filter"
+            )
+        if not any(batch.filter.model_dump().values()):
+            # An empty filter would select every user, admins included
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="filter needs at least one of department, joining_date_from or joining_date_to"
+            )
+        query = select(User)
+        if batch.filter.department:
+            query = query.where(User.department == batch.filter.department)
+        if batch.filter.joining_date_from:
+            query = query.where(User.joining_date >= batch.filter.joining_date_from)
+        if batch.filter.joining_date_to:
+            query = query.where(User.joining_date <= batch.filter.joining_date_to)
+        users = (await db.execute(query.order_by(User.id))).scalars().all()
+        letters = [
+            LetterCreate(user_id=user.id, letter_type=batch.letter_type, letter_data=batch.letter_data)
+            for user in users
+        ]
+    else:
+        letters = batch.letters
+        user_ids = {letter.user_id for letter in letters}
+        users = (await db.execute(select(User).where(User.id.in_(user_ids)))).scalars().all() if user_ids else []
+    
+    users_by_id = {user.id: user for user in users}
+    items = []
+    for index, letter in enumerate(letters):
+        item = {
+            "index": index,
+            "user_id": letter.user_id,
+            "letter_type": letter.letter_type,
+            "letter_data": letter.letter_data
+        }
+        user = users_by_id.get(letter.user_id)
+        if user is None:
+            item["error"] = "User not found"
+        else:
+            item["user_data"] = build_letter_data(user, letter)
+            item["letter_data"] = stored_letter_data(item["user_data"], letter.letter_data)
+        items.append(item)
+    
+    batch_generator = BatchLetterGenerator(current_user.id)
+    
+    async def stream_events():
+        async for event in batch_generator.generate(items):
+            if stream_format == "sse":
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+            else:
+                yield json.dumps(event) + "\n"
+    
+    media_type = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    return StreamingResponse(stream_events(), media_type=media_type)
+
+@router.get("/letters/export")
+async def export_letters(
+    letter_type: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    department: Optional[str] = None,
+    current_user: User = Depends(get_admin_user)
+):
+    """
+    Export the PDFs of matching letters as a ZIP archive (admin only)
+    
+    The archive is streamed while it is built: letters are read from the
+    database in batches and each PDF is read in chunks, so memory use stays
+    constant even for tens of thousands of letters.
+    """
+    def archive_entries():
+        db = SessionLocal()
+        try:
+            query = db.query(
+                GeneratedLetter.id,
+                GeneratedLetter.letter_type,
+                GeneratedLetter.user_id,
+                GeneratedLetter.pdf_path,
+                User.employee_id
+            ).outerjoin(User, GeneratedLetter.user_id == User.id)
+            
+            if letter_type:
+                query = query.filter(GeneratedLetter.letter_type == letter_type)
+            if date_from:
+                query = query.filter(GeneratedLetter.generated_at >= datetime.combine(date_from, time.min))
+            if date_to:
+                query = query.filter(GeneratedLetter.generated_at < datetime.combine(date_to + timedelta(days=1), time.min))
+            if department:
+                query = query.filter(User.department == department)
+            
+            for row in query.order_by(GeneratedLetter.id).yield_per(500):
+                if row.pdf_path:
+                    employee = row.employee_id or f"user{row.user_id}"
+                    yield f"{row.letter_type}/{row.id}_{employee}.pdf", row.pdf_path
+        finally:
+            db.close()
+    
+    filename = f"letters_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return StreamingResponse(
+        stream_zip(archive_entries()),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.delete("/letters/{letter_id}")
+async def delete_letter(
+    letter_id: int,
+    current_user: User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Delete a generated letter and its PDF once no other letter shares it (admin only)"""
+    letter = await db.get(GeneratedLetter, letter_id)
+    if not letter:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Letter not found"
+        )
+    
+    unsent = await db.scalar(select(func.count()).select_from(EmailOutbox).where(
+        EmailOutbox.letter_id == letter_id,
+        EmailOutbox.status.in_(("pending", "sending"))
+    ))
+    if unsent:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Letter has emails waiting to be sent; delete it once they are delivered"
+        )
+    
+    # Email history outlives the letter, without the reference to it
+    await db.execute(update(EmailOutbox).where(EmailOutbox.letter_id == letter_id).values(letter_id=None))
+    await db.execute(update(EmailLog).where(EmailLog.letter_id == letter_id).values(letter_id=None))
+    
+    pdf_path = letter.pdf_path
+    await db.delete(letter)
+    await db.commit()
+    
+    await db.run_sync(PDFStore().release, pdf_path)
+    return {"message": "Letter deleted successfully"}
+
+# Letter Campaign Endpoints
+@router.post("/campaigns", response_model=LetterCampaignResponse)
+async def create_letter_campaign(
+    campaign: LetterCampaignCreate,
+    current_user: User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Generate a letter type for every user matching a filter (admin only)
+    
+    Users who already have a letter of this type are skipped. The campaign
+    runs in the background and resumes after a restart; poll
+    GET /campaigns/{campaign_id} for progress.
+    """
+    if campaign.letter_type not in LetterGenerator.SUPPORTED_LETTER_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported letter type: {campaign.letter_type}"
+        )
+    if not any(campaign.filter.model_dump().values()):
+        # An empty filter would select every user, admins included
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="filter needs at least one of department, joining_date_from or joining_date_to"
+        )
+    
+    db_campaign = await db.run_sync(
+        create_campaign,
+        campaign.letter_type,
+        campaign.filter.model_dump(mode="json", exclude_none=True),
+        campaign.letter_data,
+        campaign.send_email,
+        campaign.name,
+        current_user.id
+    )
+    get_campaign_runner().start(db_campaign.id)
+    return db_campaign
+
+@router.get("/campaigns", response_model=List[LetterCampaignResponse])
+async def get_letter_campaigns(
+    skip: int = 0,
+    limit: int = 100,
+    current_user: User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get all letter campaigns, newest first (admin only)"""
+    result = await db.execute(
+        select(LetterCampaign).order_by(LetterCampaign.id.desc()).offset(skip).limit(limit)
+    )
+    return result.scalars().all()
+
+@router.get("/campaigns/{campaign_id}", response_model=LetterCampaignResponse)
+async def get_letter_campaign(
+    campaign_id: int,
+    current_user: User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get a letter campaign and its progress (admin only)"""
+    campaign = await db.get(LetterCampaign, campaign_id)
+    if not campaign:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Campaign not found"
+        )
+    return campaign
+
+@router.post("/campaigns/{campaign_id}/cancel", response_model=LetterCampaignResponse)
+async def cancel_letter_campaign(
+    campaign_id: int,
+    current_user: User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Stop a running campaign; letters generated so far are kept (admin only)"""
+    campaign = await db.get(LetterCampaign, campaign_id)
+    if not campaign:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Campaign not found"
+        )
+    if campaign.status not in ("pending", "running"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Campaign is already {campaign.status}"
+        )
+    
+    await get_campaign_runner().cancel(campaign_id)
+    await db.refresh(campaign)
+    return campaign
+
+@router.post("/campaigns/{campaign_id}/resume", response_model=LetterCampaignResponse)
+async def resume_letter_campaign(
+    campaign_id: int,
+    current_user: User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Continue a cancelled or failed campaign, or retry the failed letters of a completed one (admin only)"""
+    campaign = await db.get(LetterCampaign, campaign_id)
+    if not campaign:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Campaign not found"
+        )
+    if campaign.status == "completed" and not campaign.failed:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Campaign is already completed"
+        )
+    
+    get_campaign_runner().start(campaign_id)
+    return campaign
+
 # Template Management Endpoints
 @router.get("/templates", response_model=List[TemplateResponse])
 async def get_templates(
     current_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all letter templates (admin only)"""
-    templates = db.query(LetterTemplate).all()
-    return templates
+    result = await db.execute(select(LetterTemplate))
+    return result.scalars().all()
 
 @router.post("/templates", response_model=TemplateResponse)
 async def create_template(
     template: TemplateCreate,
     current_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new letter template (admin only)"""
     db_template = LetterTemplate(
@@ -318,8 +725,8 @@ async def create_template(
     )
     
     db.add(db_template)
-    db.commit()
-    db.refresh(db_template)
+    await db.commit()
+    await db.refresh(db_template)
     
     return db_template
 
@@ -327,21 +734,36 @@ async def create_template(
 @router.get("/stats")
 async def get_dashboard_stats(
     current_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get dashboard statistics (admin only)
+    
+    Totals are read from counters kept up to date as rows are written, so
+    this does not scan the letter tables; results are cached for
+    STATS_CACHE_TTL seconds.
+    """
+    return await db.run_sync(dashboard_stats.get_dashboard_stats)
+
+@router.get("/stats/daily")
+async def get_daily_dashboard_stats(
+    days: int = Query(30, ge=1, le=366),
+    metric: Optional[List[str]] = Query(None),
+    current_user: User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get per-day counts for charting (admin only)
+    
+    Metrics default to letters, users, emails.sent and emails.failed;
+    letters.type.<letter_type> is also available. Each series has one value
+    per day, oldest first.
+    """
+    return await db.run_sync(dashboard_stats.get_daily_stats, days, metric)
+
+@router.get("/email/queue")
+async def get_email_queue_stats(
+    current_user: User = Depends(get_admin_user)
 ):
-    """Get dashboard statistics (admin only)"""
-    total_users = db.query(User).count()
-    total_letters = db.query(GeneratedLetter).count()
-    total_templates = db.query(LetterTemplate).count()
-    
-    # Recent letters
-    recent_letters = db.query(GeneratedLetter).order_by(
-        GeneratedLetter.generated_at.desc()
-    ).limit(5).all()
-    
-    return {
-        "total_users": total_users,
-        "total_letters": total_letters,
-        "total_templates": total_templates,
-        "recent_letters": recent_letters
-    }
+    """Get outbox depth, estimated drain time and send-rate limits (admin only)"""
+    return await run_in_threadpool(get_email_dispatcher().stats)
@@ -1,8 +1,10 @@
 # Authentication routes
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.database import get_db
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.models.user import User
 from app.schemas import UserCreate, UserResponse, LoginRequest, Token
 from app.auth import (
@@ -16,12 +18,13 @@ from app.auth import (
 router = APIRouter()
 
 @router.post("/register", response_model=UserResponse)
-async def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user"""
     # Check if user already exists
-    db_user = db.query(User).filter(
+    result = await db.execute(select(User).where(
         (User.username == user.username) | (User.email == user.email)
-    ).first()
+    ))
+    db_user = result.scalars().first()
     
     if db_user:
         raise HTTPException(
@@ -30,7 +33,7 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await run_in_threadpool(get_password_hash, user.password)
     db_user = User(
         username=user.username,
         email=user.email,
@@ -44,15 +47,15 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
 @router.post("/login", response_model=Token)
-async def login_user(login_data: LoginRequest, db: Session = Depends(get_db)):
+async def login_user(login_data: LoginRequest, db: AsyncSession = Depends(get_async_db)):
     """Login user and return access token"""
-    user = authenticate_user(db, login_data.username, login_data.password)
+    user = await authenticate_user(db, login_data.username, login_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
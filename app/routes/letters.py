@@ -1,16 +1,80 @@
-# This file will contain letter routes and logic
-from fastapi import APIRouter
+# Letter routes for employees to view and download their letters
+import os
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
+from app.models.user import User
+from app.models.letter import GeneratedLetter
+from app.schemas import LetterResponse
+from app.auth import get_current_active_user
+from app.utils.pdf_store import PDFStore
 
 router = APIRouter()
 
-@router.get("/api/letters/{id}")
-def get_letter(id: int):
-    # TODO: Implement letter retrieval
-    return {"message": f"Letter {id}"}
+async def _get_accessible_letter(letter_id, current_user, db):
+    """Get a letter owned by the current user (any letter for admins)"""
+    letter = await db.get(GeneratedLetter, letter_id)
+    if not letter or (current_user.role != "admin" and letter.user_id != current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Letter not found"
+        )
+    return letter
 
-@router.post("/api/letters/generate")
-def generate_letter():
-    # TODO: Implement letter generation
-    return {"message": "Generate letter"}
+def _etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header against an entity tag"""
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in tags)
 
-# ...other letter endpoints...
+@router.get("/{letter_id}", response_model=LetterResponse)
+async def get_letter(
+    letter_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get a generated letter"""
+    return await _get_accessible_letter(letter_id, current_user, db)
+
+@router.get("/{letter_id}/pdf")
+async def download_letter_pdf(
+    letter_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Download the PDF of a generated letter
+    
+    Responses carry a strong ETag derived from the PDF's content hash, so
+    browsers revalidate with If-None-Match and get a 304 for unchanged
+    letters. Range requests are honoured, and the file is handed to the
+    server for sendfile when it supports the ASGI pathsend extension.
+    """
+    letter = await _get_accessible_letter(letter_id, current_user, db)
+    if not letter.pdf_path or not os.path.isfile(letter.pdf_path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Letter PDF not found"
+        )
+    
+    digest = await run_in_threadpool(PDFStore().content_digest, letter.pdf_path)
+    headers = {
+        "ETag": f'"{digest}"',
+        "Cache-Control": "private, no-cache"
+    }
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    return FileResponse(
+        letter.pdf_path,
+        media_type="application/pdf",
+        filename=f"{letter.letter_type}_{letter.id}.pdf",
+        headers=headers,
+        content_disposition_type="inline"
+    )
@@ -1,16 +1,34 @@
-# This file will contain user routes and logic
-from fastapi import APIRouter
+# User routes for employees to view their own profile and letters
+from typing import List
+from fastapi import APIRouter, Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
+from app.models.user import User
+from app.models.letter import GeneratedLetter
+from app.schemas import UserResponse, LetterResponse
+from app.auth import get_current_active_user
 
 router = APIRouter()
 
-@router.get("/api/user/profile")
-def get_profile():
-    # TODO: Implement profile retrieval
-    return {"message": "User profile"}
+@router.get("/profile", response_model=UserResponse)
+async def get_profile(current_user: User = Depends(get_current_active_user)):
+    """Get the current user's profile"""
+    return current_user
 
-@router.get("/api/user/letters")
-def get_letters():
-    # TODO: Implement letter listing
-    return {"message": "User letters"}
-
-# ...other user endpoints...
+@router.get("/letters", response_model=List[LetterResponse])
+async def get_letters(
+    skip: int = 0,
+    limit: int = 100,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the current user's letters, newest first"""
+    result = await db.execute(
+        select(GeneratedLetter)
+        .where(GeneratedLetter.user_id == current_user.id)
+        .order_by(GeneratedLetter.generated_at.desc(), GeneratedLetter.id.desc())
+        .offset(skip)
+        .limit(limit)
+    )
+    return result.scalars().all()
@@ -1,6 +1,6 @@
 # Pydantic schemas for request/response validation
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime, date
 
 # User schemas
@@ -63,6 +63,45 @@ class LetterCreate(LetterBase):
     manager: Optional[str] = None
     reason: Optional[str] = None
 
+class LetterBatchFilter(BaseModel):
+    department: Optional[str] = None
+    joining_date_from: Optional[date] = None
+    joining_date_to: Optional[date] = None
+
+class LetterBatchCreate(BaseModel):
+    # Either an explicit list of letters, or a user filter plus a letter type
+    letters: Optional[List[LetterCreate]] = None
+    filter: Optional[LetterBatchFilter] = None
+    letter_type: Optional[str] = None
+    letter_data: Optional[dict] = None
+
+class LetterCampaignCreate(BaseModel):
+    letter_type: str
+    filter: LetterBatchFilter
+    letter_data: Optional[dict] = None
+    send_email: bool = True
+    name: Optional[str] = None
+
+class LetterCampaignResponse(BaseModel):
+    id: int
+    name: Optional[str] = None
+    letter_type: str
+    send_email: bool
+    status: str
+    total: int
+    skipped: int
+    generated: int
+    failed: int
+    last_user_id: int
+    last_error: Optional[str] = None
+    created_by: Optional[int] = None
+    created_at: datetime
+    updated_at: datetime
+    completed_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
 class LetterResponse(LetterBase):
     id: int
     user_id: int
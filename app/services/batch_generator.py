@@ -0,0 +1,150 @@
+# Batch letter generation service
+import asyncio
+from fastapi.concurrency import run_in_threadpool
+from app.database import SessionLocal
+from app.models.letter import GeneratedLetter
+from app.services.letter_generator import LetterGenerator
+from app.services.render_engine import get_render_engine, RenderQueueFull
+from config import Config
+
+class BatchLetterGenerator:
+    """
+    Render many letters in parallel and insert their rows in bulk
+    
+    Each item is a dict with index, user_id, letter_type, user_data (template
+    context) and letter_data (stored on the GeneratedLetter row). Items that
+    already carry an "error" are reported as failed without rendering.
+    
+    Renders run concurrently on the render engine; finished letters are
+    inserted in bulk every insert_batch_size items. generate() yields one
+    event dict per item followed by a summary, so callers can stream progress.
+    
+    on_insert, if given, is called as on_insert(db, inserted) inside each
+    insert transaction, with inserted a list of (item, GeneratedLetter)
+    pairs, so callers can write related rows atomically with the letters.
+    Inserts run on the thread pool, so on_insert runs there too.
+    """
+    
+    def __init__(self, generated_by, insert_batch_size=None, concurrency=None, retry_delay=0.1,
+                 on_insert=None):
+        engine = get_render_engine()
+        self.generated_by = generated_by
+        self.insert_batch_size = insert_batch_size or Config.BATCH_INSERT_SIZE
+        self.concurrency = concurrency or max(1, min(engine.max_queue, max(engine.max_workers, 1) * 2))
+        self.retry_delay = retry_delay
+        self.on_insert = on_insert
+        self.letter_generator = LetterGenerator()
+    
+    async def _render(self, semaphore, item):
+        async with semaphore:
+            while True:
+                try:
+                    pdf_path = await self.letter_generator.generate_letter_async(
+                        item["letter_type"], item["user_data"]
+                    )
+                    return item, pdf_path, None
+                except RenderQueueFull:
+                    # Other requests are using the engine; wait for a free slot
+                    await asyncio.sleep(self.retry_delay)
+                except Exception as e:
+                    return item, None, str(e)
+    
+    def _insert(self, db, rendered):
+        """Insert rendered letters in one transaction and return their events"""
+        letters = [
+            GeneratedLetter(
+                user_id=item["user_id"],
+                letter_type=item["letter_type"],
+                letter_data=item["letter_data"],
+                generated_by=self.generated_by,
+                status="generated",
+                pdf_path=pdf_path
+            )
+            for item, pdf_path in rendered
+        ]
+        try:
+            db.add_all(letters)
+            db.flush()
+            letter_ids = [db_letter.id for db_letter in letters]
+            if self.on_insert:
+                self.on_insert(db, [(item, db_letter) for (item, _), db_letter in zip(rendered, letters)])
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            return [self._failed_event(item, f"Error saving letter: {e}") for item, _ in rendered]
+        
+        return [
+            {
+                "event": "item",
+                "index": item["index"],
+                "user_id": item["user_id"],
+                "status": "generated",
+                "letter_id": letter_id,
+                "pdf_path": pdf_path
+            }
+            for (item, pdf_path), letter_id in zip(rendered, letter_ids)
+        ]
+    
+    @staticmethod
+    def _failed_event(item, error):
+        return {
+            "event": "item",
+            "index": item["index"],
+            "user_id": item["user_id"],
+            "status": "failed",
+            "error": error
+        }
+    
+    async def generate(self, items):
+        """
+        Generate letters for all items
+        
+        Yields:
+            {"event": "start"}, one {"event": "item"} per item in completion
+            order, then {"event": "summary"}
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = [
+            asyncio.create_task(self._render(semaphore, item))
+            for item in items if not item.get("error")
+        ]
+        counts = {"generated": 0, "failed": 0}
+        db = SessionLocal()
+        
+        def record(events):
+            for event in events:
+                counts[event["status"]] += 1
+            return events
+        
+        try:
+            yield {"event": "start", "total": len(items)}
+            
+            for item in items:
+                if item.get("error"):
+                    for event in record([self._failed_event(item, item["error"])]):
+                        yield event
+            
+            rendered = []
+            for next_done in asyncio.as_completed(tasks):
+                item, pdf_path, error = await next_done
+                if error or not pdf_path:
+                    for event in record([self._failed_event(item, error or "Error generating letter PDF")]):
+                        yield event
+                    continue
+                
+                rendered.append((item, pdf_path))
+                if len(rendered) >= self.insert_batch_size:
+                    for event in record(await run_in_threadpool(self._insert, db, rendered)):
+                        yield event
+                    rendered = []
+            
+            if rendered:
+                for event in record(await run_in_threadpool(self._insert, db, rendered)):
+                    yield event
+            
+            yield {"event": "summary", "total": len(items), **counts}
+        finally:
+            # Stop outstanding renders if the client went away mid-stream
+            for task in tasks:
+                task.cancel()
+            db.close()
@@ -0,0 +1,263 @@
+# Resumable letter campaigns over every user matching a filter
+import asyncio
+import json
+from datetime import date, datetime
+from sqlalchemy import exists
+from fastapi.concurrency import run_in_threadpool
+from config import Config
+from app.database import SessionLocal
+from app.models.user import User
+from app.models.letter import GeneratedLetter
+from app.models.campaign import LetterCampaign
+from app.schemas import LetterCreate
+from app.services.batch_generator import BatchLetterGenerator
+from app.services.email_outbox import get_email_dispatcher
+from app.services.email_service import EmailService
+from app.services.letter_generator import build_letter_data, stored_letter_data
+
+# Filters a campaign must set at least one of
+CAMPAIGN_FILTER_FIELDS = ("department", "joining_date_from", "joining_date_to")
+
+def campaign_user_query(db, letter_type, filters, pending_only=True):
+    """
+    Build the query for the users a campaign targets
+    
+    Args:
+        db: Database session
+        letter_type: Letter type the campaign generates
+        filters: Dictionary with optional department, joining_date_from and joining_date_to
+        pending_only: Leave out users who already have a letter of this type
+    
+    Returns:
+        Query over User
+    """
+    query = db.query(User)
+    if filters.get("department"):
+        query = query.filter(User.department == filters["department"])
+    if filters.get("joining_date_from"):
+        query = query.filter(User.joining_date >= date.fromisoformat(filters["joining_date_from"]))
+    if filters.get("joining_date_to"):
+        query = query.filter(User.joining_date <= date.fromisoformat(filters["joining_date_to"]))
+    if pending_only:
+        # A user who already has a letter of this type gets no second one
+        query = query.filter(~exists().where(
+            GeneratedLetter.user_id == User.id,
+            GeneratedLetter.letter_type == letter_type
+        ))
+    return query
+
+def create_campaign(db, letter_type, filters, letter_data=None, send_email=True, name=None, created_by=None):
+    """
+    Create a campaign and count the users it targets and skips
+    
+    Returns:
+        The committed LetterCampaign
+    
+    Raises:
+        ValueError: If filters has none of department, joining_date_from or joining_date_to
+    """
+    if not any(filters.get(name) for name in CAMPAIGN_FILTER_FIELDS):
+        # An empty filter would target every user, admins included
+        raise ValueError("filter needs at least one of department, joining_date_from or joining_date_to")
+    
+    total = campaign_user_query(db, letter_type, filters, pending_only=False).count()
+    pending = campaign_user_query(db, letter_type, filters).count()
+    campaign = LetterCampaign(
+        name=name,
+        letter_type=letter_type,
+        filters=json.dumps(filters),
+        letter_data=json.dumps(letter_data) if letter_data else None,
+        send_email=send_email,
+        status="pending",
+        total=total,
+        skipped=total - pending,
+        generated=0,
+        failed=0,
+        last_user_id=0,
+        created_by=created_by
+    )
+    db.add(campaign)
+    db.commit()
+    db.refresh(campaign)
+    return campaign
+
+class CampaignRunner:
+    """
+    Runs letter campaigns in the background and resumes them after a restart
+    
+    A campaign walks its target users in id order, chunk_size at a time.
+    Each chunk is rendered and inserted through BatchLetterGenerator; the
+    letters, their outbox emails and the campaign's counters are written in
+    the same transaction, and last_user_id advances once the whole chunk is
+    done, but never past a user whose letter failed. A restarted or resumed
+    campaign continues from last_user_id; users who already got their
+    letter are skipped by the campaign's deduplication filter, so only the
+    failed users and those not reached yet are processed again.
+    """
+    
+    def __init__(self, chunk_size=None):
+        self.chunk_size = chunk_size or Config.CAMPAIGN_CHUNK_SIZE
+        self._tasks = {}
+    
+    def start(self, campaign_id):
+        """Start (or resume) a campaign in the background"""
+        task = self._tasks.get(campaign_id)
+        if task is None or task.done():
+            self._tasks[campaign_id] = asyncio.create_task(self._run(campaign_id))
+    
+    def is_running(self, campaign_id):
+        task = self._tasks.get(campaign_id)
+        return task is not None and not task.done()
+    
+    async def resume_all(self):
+        """Restart campaigns that were pending or running when the process stopped"""
+        db = SessionLocal()
+        try:
+            campaign_ids = [
+                campaign_id for (campaign_id,) in db.query(LetterCampaign.id).filter(
+                    LetterCampaign.status.in_(["pending", "running"])
+                ).order_by(LetterCampaign.id)
+            ]
+        finally:
+            db.close()
+        for campaign_id in campaign_ids:
+            self.start(campaign_id)
+    
+    async def cancel(self, campaign_id):
+        """Stop a campaign; letters already inserted are kept and it can be resumed later"""
+        task = self._tasks.pop(campaign_id, None)
+        if task is not None:
+            task.cancel()
+        await run_in_threadpool(self._update, campaign_id, status="cancelled")
+    
+    async def stop(self):
+        """Stop all campaigns; they stay running in the database and resume on next start"""
+        tasks, self._tasks = list(self._tasks.values()), {}
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def _update(self, campaign_id, **fields):
+        db = SessionLocal()
+        try:
+            db.query(LetterCampaign).filter(LetterCampaign.id == campaign_id).update(
+                fields, synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+    
+    def _load(self, campaign_id):
+        db = SessionLocal()
+        try:
+            campaign = db.query(LetterCampaign).filter(LetterCampaign.id == campaign_id).first()
+            if campaign is not None:
+                db.expunge(campaign)
+            return campaign
+        finally:
+            db.close()
+    
+    def _next_chunk(self, campaign, filters, letter_data, after_user_id):
+        """Load the next chunk of target users after a user id and build their batch items"""
+        db = SessionLocal()
+        try:
+            users = campaign_user_query(db, campaign.letter_type, filters).filter(
+                User.id > after_user_id
+            ).order_by(User.id).limit(self.chunk_size).all()
+            items = []
+            for index, user in enumerate(users):
+                letter = LetterCreate(user_id=user.id, letter_type=campaign.letter_type, letter_data=letter_data)
+                user_data = build_letter_data(user, letter)
+                items.append({
+                    "index": index,
+                    "user_id": user.id,
+                    "email": user.email,
+                    "letter_type": campaign.letter_type,
+                    "letter_data": stored_letter_data(user_data, letter_data),
+                    "user_data": user_data
+                })
+            return items
+        finally:
+            db.close()
+    
+    async def _run(self, campaign_id):
+        campaign = await run_in_threadpool(self._load, campaign_id)
+        if campaign is None:
+            return
+        filters = json.loads(campaign.filters or "{}")
+        letter_data = json.loads(campaign.letter_data) if campaign.letter_data else None
+        # Users who failed in an earlier run are retried by this one and counted again
+        await run_in_threadpool(self._update, campaign_id, status="running", failed=0)
+        cursor = campaign.last_user_id
+        retry_pending = False
+        
+        def on_insert(db, inserted):
+            # Letters, their emails and the campaign counters commit together
+            if campaign.send_email:
+                email_service = EmailService(db)
+                for item, db_letter in inserted:
+                    email_service.queue_letter_notification(
+                        item["email"], campaign.letter_type, db_letter.pdf_path, db_letter.id
+                    )
+            db.query(LetterCampaign).filter(LetterCampaign.id == campaign_id).update(
+                {LetterCampaign.generated: LetterCampaign.generated + len(inserted)},
+                synchronize_session=False
+            )
+        
+        try:
+            while True:
+                items = await run_in_threadpool(self._next_chunk, campaign, filters, letter_data, cursor)
+                if not items:
+                    break
+                
+                batch_generator = BatchLetterGenerator(campaign.created_by, on_insert=on_insert)
+                failed_user_ids = []
+                async for event in batch_generator.generate(items):
+                    if event["event"] == "item" and event["status"] == "failed":
+                        failed_user_ids.append(event["user_id"])
+                        print(f"Campaign {campaign_id}: letter for user {event['user_id']} failed: {event['error']}")
+                
+                # This run moves on past failed users, but the saved position
+                # stops just before the first one so a resume retries it
+                cursor = items[-1]["user_id"]
+                if not retry_pending:
+                    if failed_user_ids:
+                        campaign.last_user_id = min(failed_user_ids) - 1
+                        retry_pending = True
+                    else:
+                        campaign.last_user_id = cursor
+                await run_in_threadpool(
+                    self._update, campaign_id,
+                    last_user_id=campaign.last_user_id,
+                    failed=LetterCampaign.failed + len(failed_user_ids)
+                )
+                if campaign.send_email:
+                    get_email_dispatcher().notify()
+            
+            await run_in_threadpool(
+                self._update, campaign_id, status="completed", completed_at=datetime.utcnow()
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Campaign {campaign_id} failed: {e}")
+            await run_in_threadpool(self._update, campaign_id, status="failed", last_error=str(e))
+        finally:
+            if self._tasks.get(campaign_id) is asyncio.current_task():
+                del self._tasks[campaign_id]
+
+_campaign_runner = None
+
+def get_campaign_runner():
+    """Get the process-wide campaign runner"""
+    global _campaign_runner
+    if _campaign_runner is None:
+        _campaign_runner = CampaignRunner()
+    return _campaign_runner
+
+async def shutdown_campaign_runner():
+    """Stop the process-wide campaign runner, if it was created"""
+    global _campaign_runner
+    if _campaign_runner is not None:
+        await _campaign_runner.stop()
+        _campaign_runner = None
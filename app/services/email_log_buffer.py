@@ -0,0 +1,133 @@
+# Buffered EmailLog writer flushing records in bulk inserts
+import atexit
+import threading
+from datetime import datetime
+from sqlalchemy import insert
+from config import Config
+from app.database import SessionLocal
+from app.models.email_log import EmailLog
+
+class EmailLogBuffer:
+    """
+    Collects email log records and writes them in bulk
+    
+    Records are inserted with one executemany and one commit per flush, on a
+    session of the buffer's own. A flush happens when max_batch records are
+    waiting, every flush_interval seconds from a background thread, when
+    flush() is called at the end of a batch job, and on close() at shutdown.
+    
+    If a flush fails the records are kept for the next one, up to
+    max_pending records; older records beyond that are dropped.
+    """
+    
+    def __init__(self, max_batch=None, flush_interval=None, max_pending=None):
+        self.max_batch = max_batch or Config.EMAIL_LOG_BATCH_SIZE
+        self.flush_interval = (
+            Config.EMAIL_LOG_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        )
+        self.max_pending = max_pending or self.max_batch * 10
+        self._records = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {"flushes": 0, "written": 0, "dropped": 0}
+    
+    def start(self):
+        """Start the background thread that flushes every flush_interval seconds"""
+        if self._thread is None and self.flush_interval > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="email-log-flush", daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+    
+    def add(self, recipient_email, subject, status, letter_id=None, body=None):
+        """Queue one log record; flushes in the caller's thread once max_batch are waiting"""
+        record = {
+            "recipient_email": recipient_email,
+            "subject": subject,
+            "body": body,
+            "status": status,
+            "letter_id": letter_id,
+            "sent_at": datetime.utcnow()
+        }
+        with self._lock:
+            self._records.append(record)
+            full = len(self._records) >= self.max_batch
+        if full:
+            self.flush()
+    
+    def flush(self):
+        """
+        Write every waiting record
+        
+        Returns:
+            Number of records written
+        """
+        with self._flush_lock:
+            with self._lock:
+                records, self._records = self._records, []
+            if not records:
+                return 0
+            
+            db = SessionLocal()
+            try:
+                db.execute(insert(EmailLog), records)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                print(f"Error writing email logs: {e}")
+                with self._lock:
+                    self._records = records + self._records
+                    overflow = len(self._records) - self.max_pending
+                    if overflow > 0:
+                        del self._records[:overflow]
+                        self._stats["dropped"] += overflow
+                return 0
+            finally:
+                db.close()
+            
+            self._stats["flushes"] += 1
+            self._stats["written"] += len(records)
+            return len(records)
+    
+    def pending(self):
+        with self._lock:
+            return len(self._records)
+    
+    def stats(self):
+        """Get flush counters and the number of records waiting"""
+        return {**self._stats, "pending": self.pending()}
+    
+    def close(self):
+        """Stop the background thread and write the remaining records"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+_email_log_buffer = None
+_email_log_buffer_lock = threading.Lock()
+
+def get_email_log_buffer():
+    """Get the process-wide email log buffer, flushed at interpreter exit"""
+    global _email_log_buffer
+    if _email_log_buffer is None:
+        with _email_log_buffer_lock:
+            if _email_log_buffer is None:
+                _email_log_buffer = EmailLogBuffer()
+                _email_log_buffer.start()
+                atexit.register(_email_log_buffer.close)
+    return _email_log_buffer
+
+def shutdown_email_log_buffer():
+    """Flush and stop the process-wide email log buffer, if it was created"""
+    global _email_log_buffer
+    if _email_log_buffer is not None:
+        atexit.unregister(_email_log_buffer.close)
+        _email_log_buffer.close()
+        _email_log_buffer = None
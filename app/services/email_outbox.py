@@ -0,0 +1,310 @@
+# Durable email outbox drained by background workers
+import asyncio
+import os
+import random
+import smtplib
+from datetime import datetime, timedelta
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
+from dotenv import load_dotenv
+from config import Config
+from app.database import SessionLocal
+from app.models.email_outbox import EmailOutbox
+from app.services.email_log_buffer import get_email_log_buffer
+from app.models.letter import GeneratedLetter
+from app.services.rate_limiter import SendRateScheduler
+from send_mail import deliver_email_async, get_attachment_cache
+
+load_dotenv()
+
+def enqueue_email(db, recipient_email, subject, body, attachment_path=None, attachment_name=None,
+                  letter_id=None):
+    """
+    Add an email to the outbox in the caller's transaction
+    
+    The message is only visible to the workers once the caller commits, so
+    it is queued if and only if the rows written alongside it are saved.
+    Call get_email_dispatcher().notify() after committing to wake a worker.
+    
+    Args:
+        db: Database session the message is added to (not committed)
+        recipient_email: Recipient's email address
+        subject: Email subject
+        body: Email body text
+        attachment_path: Optional path of a stored PDF to attach when sending
+        attachment_name: Optional filename shown for the attachment
+        letter_id: Optional GeneratedLetter the email delivers
+    
+    Returns:
+        The pending EmailOutbox row
+    """
+    now = datetime.utcnow()
+    message = EmailOutbox(
+        recipient_email=recipient_email,
+        subject=subject,
+        body=body,
+        attachment_path=attachment_path,
+        attachment_name=attachment_name,
+        letter_id=letter_id,
+        status="pending",
+        attempts=0,
+        next_attempt_at=now,
+        created_at=now
+    )
+    db.add(message)
+    return message
+
+async def prime_attachment(pdf_path, pdf_data):
+    """
+    Encode a just-stored PDF into the attachment cache for its queued email
+    
+    The outbox worker then finds the encoded attachment by path instead of
+    reading the file back. Failures only cost that read, so they are logged
+    and ignored.
+    """
+    try:
+        await run_in_threadpool(get_attachment_cache().encode_file, pdf_path, pdf_data)
+    except Exception as e:
+        print(f"Error caching attachment {pdf_path}: {e}")
+
+def is_permanent_failure(error):
+    """True if retrying the send cannot succeed (recipient refused or other 5xx reply)"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return False
+    return isinstance(error, smtplib.SMTPResponseException) and 500 <= error.smtp_code < 600
+
+class EmailDispatcher:
+    """
+    Background workers that deliver queued outbox emails
+    
+    Each worker claims one due message at a time, sends it on the asyncio
+    SMTP engine (send_mail.deliver_email_async) and records the outcome: delivered messages are
+    logged in EmailLog (through the email log buffer) and mark their letter as sent; failed sends are
+    retried with exponential backoff until max_attempts, after which the
+    message is dead-lettered and its letter marked as failed.
+    
+    Sends go through a SendRateScheduler first: a message over the sender or
+    recipient-domain rate limit is deferred until a slot frees up, without
+    counting as a failed attempt.
+    
+    Messages claimed by a worker that never finished (e.g. the process was
+    killed) are returned to the queue when the dispatcher starts.
+    
+    With workers=0 nothing is delivered; messages stay queued in the outbox.
+    """
+    
+    def __init__(self, workers=None, max_attempts=None, retry_base=None, retry_max=None,
+                 poll_interval=None, scheduler=None):
+        self.workers = Config.EMAIL_WORKERS if workers is None else workers
+        self.max_attempts = max_attempts or Config.EMAIL_MAX_ATTEMPTS
+        self.retry_base = Config.EMAIL_RETRY_BASE_SECONDS if retry_base is None else retry_base
+        self.retry_max = Config.EMAIL_RETRY_MAX_SECONDS if retry_max is None else retry_max
+        self.poll_interval = Config.EMAIL_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.sender_email = os.getenv("SENDER_EMAIL")
+        self.sender_password = os.getenv("SENDER_PASSWORD")
+        self.scheduler = scheduler or SendRateScheduler()
+        self._tasks = []
+        self._wakeup = None
+        self._stopping = False
+        self._stats = {"sent": 0, "retried": 0, "dead": 0}
+    
+    async def start(self):
+        """Requeue interrupted messages and start the worker tasks"""
+        if self._tasks or self.workers <= 0:
+            return
+        await run_in_threadpool(self._requeue_interrupted)
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+    
+    def notify(self):
+        """Wake idle workers after new messages were committed"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+    
+    async def stop(self):
+        """Stop the workers once their current sends finish"""
+        tasks, self._tasks = self._tasks, []
+        self._stopping = True
+        self.notify()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def retry_delay(self, attempts):
+        """Seconds to wait before the next attempt, doubling per attempt with jitter"""
+        delay = min(self.retry_base * 2 ** max(attempts - 1, 0), self.retry_max)
+        return delay * random.uniform(0.8, 1.2)
+    
+    async def _worker(self):
+        while not self._stopping:
+            try:
+                message = await run_in_threadpool(self._claim)
+                if message is None:
+                    await self._wait()
+                    continue
+                delay = self.scheduler.reserve(self.sender_email, message.recipient_email)
+                if delay > 0:
+                    await run_in_threadpool(self._defer, message, delay)
+                    continue
+                await self._deliver(message)
+            except Exception as e:
+                print(f"Error in email worker: {e}")
+                await self._wait()
+    
+    async def _wait(self):
+        if self._stopping:
+            return
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+    
+    def _requeue_interrupted(self):
+        db = SessionLocal()
+        try:
+            db.query(EmailOutbox).filter(EmailOutbox.status == "sending").update(
+                {EmailOutbox.status: "pending"}, synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+    
+    def _claim(self):
+        """Atomically move the oldest due message from pending to sending"""
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            candidates = db.query(EmailOutbox.id).filter(
+                EmailOutbox.status == "pending",
+                EmailOutbox.next_attempt_at <= now
+            ).order_by(EmailOutbox.next_attempt_at, EmailOutbox.id).limit(self.workers).all()
+            
+            for (message_id,) in candidates:
+                # Another worker may claim the same row first; the status check makes this a no-op then
+                claimed = db.query(EmailOutbox).filter(
+                    EmailOutbox.id == message_id,
+                    EmailOutbox.status == "pending"
+                ).update({
+                    EmailOutbox.status: "sending",
+                    EmailOutbox.attempts: EmailOutbox.attempts + 1
+                }, synchronize_session=False)
+                db.commit()
+                if claimed:
+                    message = db.query(EmailOutbox).filter(EmailOutbox.id == message_id).first()
+                    db.expunge(message)
+                    return message
+            return None
+        finally:
+            db.close()
+    
+    def _defer(self, message, delay):
+        """Return a claimed message to the queue without counting the attempt"""
+        db = SessionLocal()
+        try:
+            db.query(EmailOutbox).filter(EmailOutbox.id == message.id).update({
+                EmailOutbox.status: "pending",
+                EmailOutbox.attempts: EmailOutbox.attempts - 1,
+                EmailOutbox.next_attempt_at: datetime.utcnow() + timedelta(seconds=delay)
+            }, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+    
+    async def _deliver(self, message):
+        error = None
+        try:
+            await deliver_email_async(
+                self.sender_email,
+                self.sender_password,
+                message.recipient_email,
+                message.subject,
+                message.body,
+                message.attachment_path,
+                message.attachment_name
+            )
+        except Exception as e:
+            error = e
+        await run_in_threadpool(self._record, message, error)
+    
+    def _record(self, message, error):
+        """Store the outcome of a send attempt"""
+        outcome = None
+        db = SessionLocal()
+        try:
+            row = db.query(EmailOutbox).filter(EmailOutbox.id == message.id).first()
+            letter = None
+            if row.letter_id:
+                letter = db.query(GeneratedLetter).filter(GeneratedLetter.id == row.letter_id).first()
+            
+            if error is None:
+                row.status = "sent"
+                row.sent_at = datetime.utcnow()
+                row.last_error = None
+                row.body = None
+                if letter:
+                    letter.status = "sent"
+                outcome = "sent"
+                self._stats["sent"] += 1
+            elif row.attempts >= self.max_attempts or is_permanent_failure(error):
+                print(f"Giving up on email {row.id} to {row.recipient_email}: {error}")
+                row.status = "dead"
+                row.last_error = str(error)
+                row.body = None
+                if letter:
+                    letter.status = "failed"
+                outcome = "failed"
+                self._stats["dead"] += 1
+            else:
+                print(f"Email {row.id} to {row.recipient_email} failed, retrying: {error}")
+                row.status = "pending"
+                row.last_error = str(error)
+                row.next_attempt_at = datetime.utcnow() + timedelta(seconds=self.retry_delay(row.attempts))
+                self._stats["retried"] += 1
+            
+            db.commit()
+        finally:
+            db.close()
+        
+        if outcome:
+            get_email_log_buffer().add(message.recipient_email, message.subject, outcome, message.letter_id)
+    
+    def stats(self):
+        """Get worker counts, delivery counters, outbox depth and the estimated time to drain it"""
+        db = SessionLocal()
+        try:
+            rows = db.query(EmailOutbox.status, func.count(EmailOutbox.id)).group_by(EmailOutbox.status).all()
+            domain_counts = {}
+            queued = db.query(EmailOutbox.recipient_email).filter(
+                EmailOutbox.status.in_(["pending", "sending"])
+            ).yield_per(1000)
+            for (recipient_email,) in queued:
+                domain = self.scheduler.domain_of(recipient_email)
+                domain_counts[domain] = domain_counts.get(domain, 0) + 1
+        finally:
+            db.close()
+        return {
+            "workers": len(self._tasks),
+            **self._stats,
+            "outbox": {status: count for status, count in rows},
+            "queue_depth": sum(domain_counts.values()),
+            "estimated_drain_seconds": round(self.scheduler.estimate_drain(self.sender_email, domain_counts), 1),
+            "rate_limits": self.scheduler.stats()
+        }
+
+_email_dispatcher = None
+
+def get_email_dispatcher():
+    """Get the process-wide email dispatcher"""
+    global _email_dispatcher
+    if _email_dispatcher is None:
+        _email_dispatcher = EmailDispatcher()
+    return _email_dispatcher
+
+async def shutdown_email_dispatcher():
+    """Stop the process-wide email dispatcher, if it was created"""
+    global _email_dispatcher
+    if _email_dispatcher is not None:
+        await _email_dispatcher.stop()
+        _email_dispatcher = None
@@ -1,8 +1,9 @@
 import os
 from dotenv import load_dotenv
 from sqlalchemy.orm import Session
-from send_mail import send_email, send_user_credentials_email
-from app.models.email_log import EmailLog
+from send_mail import send_email, send_user_credentials_email, build_user_credentials_email
+from app.services.email_log_buffer import get_email_log_buffer
+from app.services.email_outbox import enqueue_email
 
 load_dotenv()
 
@@ -12,8 +13,9 @@ class EmailService:
         self.sender_password = os.getenv("SENDER_PASSWORD")
         self.db = db
     
-    def send_letter_notification(self, recipient_email, letter_type, pdf_path=None):
-        """Send email notification with letter PDF attachment"""
+    @staticmethod
+    def build_letter_notification(letter_type):
+        """Build the subject and body of a letter notification email"""
         subject = f"Your {letter_type.replace('_', ' ').title()} Letter"
         body = f"""Dear User,
 
@@ -23,6 +25,12 @@ If you have any questions, please contact the HR department.
 
 Best regards,
 HR Team"""
+        return subject, body
+    
+    def send_letter_notification(self, recipient_email, letter_type, pdf_path=None, pdf_data=None,
+                                 letter_id=None):
+        """Send email notification with letter PDF attachment (pdf_data skips reading pdf_path)"""
+        subject, body = self.build_letter_notification(letter_type)
         
         success = send_email(
             self.sender_email, 
@@ -30,15 +38,18 @@ HR Team"""
             recipient_email, 
             subject, 
             body, 
-            pdf_path
+            pdf_path,
+            f"{letter_type}.pdf",
+            pdf_data
         )
         
         if self.db:
-            self.log_email(recipient_email, subject, "sent" if success else "failed")
+            self.log_email(recipient_email, subject, "sent" if success else "failed", letter_id)
         
         return success
     
-    def send_user_credentials(self, recipient_email, username, password, full_name, letter_pdf_path=None):
+    def send_user_credentials(self, recipient_email, username, password, full_name, letter_pdf_path=None,
+                              letter_type=None, letter_pdf_data=None, letter_id=None):
         """Send user credentials and welcome letter via email"""
         success = send_user_credentials_email(
             self.sender_email,
@@ -47,29 +58,51 @@ HR Team"""
             username,
             password,
             full_name,
-            letter_pdf_path
+            letter_pdf_path,
+            f"{letter_type}.pdf" if letter_type else None,
+            letter_pdf_data
         )
         
         if self.db:
             subject = "Welcome to the Organization - Your Account Details"
-            self.log_email(recipient_email, subject, "sent" if success else "failed")
+            self.log_email(recipient_email, subject, "sent" if success else "failed", letter_id)
         
         return success
     
+    def queue_letter_notification(self, recipient_email, letter_type, pdf_path, letter_id):
+        """Queue a letter notification in the outbox; committed with the caller's transaction"""
+        subject, body = self.build_letter_notification(letter_type)
+        return enqueue_email(self.db, recipient_email, subject, body, pdf_path, f"{letter_type}.pdf", letter_id)
+    
+    def queue_user_credentials(self, recipient_email, username, password, full_name, letter_pdf_path=None,
+                               letter_type=None, letter_id=None):
+        """
+        Queue the credentials email (with optional welcome letter) in the outbox
+        
+        Only the password hash is stored with the user, so the body cannot be
+        rendered at send time and the plaintext password sits in
+        email_outbox.body until the row is sent or dead-lettered, when the
+        body is cleared.
+        """
+        subject, body = build_user_credentials_email(username, password, full_name)
+        return enqueue_email(
+            self.db,
+            recipient_email,
+            subject,
+            body,
+            letter_pdf_path,
+            f"{letter_type}.pdf" if letter_type else None,
+            letter_id
+        )
+    
     def log_email(self, recipient_email, subject, status, letter_id=None):
-        """Log email in database"""
+        """Log email in database; buffered and written in bulk by the email log buffer"""
         if not self.db:
             return
-            
-        email_log = EmailLog(
-            recipient_email=recipient_email,
-            subject=subject,
-            status=status,
-            letter_id=letter_id
-        )
         
-        self.db.add(email_log)
-        self.db.commit()
-        self.db.refresh(email_log)
-        
-        return email_log
+        get_email_log_buffer().add(recipient_email, subject, status, letter_id)
+    
+    @staticmethod
+    def flush_logs():
+        """Write buffered email logs now, e.g. at the end of a batch job"""
+        return get_email_log_buffer().flush()
@@ -1,6 +1,127 @@
+from datetime import date, datetime
 from app.utils.pdf_generator import PDFGenerator
+from app.services.render_engine import get_render_engine
+
+def _generate_letter_in_worker(letter_type, user_data, template_path):
+    """Entry point executed inside a render engine worker process"""
+    return LetterGenerator().generate_letter(letter_type, user_data, template_path)
+
+def _render_letter_in_worker(letter_type, user_data, template_path):
+    """Entry point executed inside a render engine worker process for in-memory renders"""
+    return LetterGenerator().render_letter(letter_type, user_data, template_path)
+
+def build_letter_data(user, letter):
+    """Build the template context for a letter from the user and request fields"""
+    user_data = {
+        'user_id': user.id,
+        'full_name': user.full_name,
+        'username': user.username,
+        'email': user.email,
+        'employee_id': user.employee_id,
+        'department': user.department,
+        'designation': user.designation,
+        'joining_date': user.joining_date.strftime("%B %d, %Y") if user.joining_date else None
+    }
+    
+    # Add any additional data from the request
+    if letter.letter_data:
+        user_data.update(letter.letter_data)
+    
+    # Override with specific fields from the request
+    if letter.department:
+        user_data['department'] = letter.department
+    if letter.position:
+        user_data['position'] = letter.position
+    if letter.salary:
+        user_data['salary'] = letter.salary
+    if letter.start_date:
+        user_data['start_date'] = letter.start_date
+    if letter.manager:
+        user_data['manager'] = letter.manager
+    if letter.end_date:
+        user_data['end_date'] = letter.end_date
+    if letter.reason:
+        user_data['reason'] = letter.reason
+    
+    return user_data
+
+# Letter fields kept on GeneratedLetter.letter_data alongside the request's own letter_data
+STORED_LETTER_FIELDS = ("position", "department", "salary", "start_date", "end_date", "manager", "reason")
+
+def _as_number(value):
+    """Read a salary such as "85000", "85,000" or "$85,000.50" as a number; other values are returned unchanged"""
+    if not isinstance(value, str):
+        return value
+    cleaned = value.strip().lstrip("$€£₹").replace(",", "").strip()
+    try:
+        number = float(cleaned)
+    except ValueError:
+        return value
+    return int(number) if number.is_integer() else number
+
+# Date formats read from free-text start dates, besides ISO
+START_DATE_FORMATS = ("%B %d, %Y", "%b %d, %Y", "%d %B %Y", "%d %b %Y", "%Y/%m/%d")
+
+def _as_iso_date(value):
+    """Read a date such as "2026-03-01" or "January 15, 2026" as an ISO YYYY-MM-DD string, or None"""
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%Y-%m-%d")
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    try:
+        return datetime.fromisoformat(value).strftime("%Y-%m-%d")
+    except ValueError:
+        pass
+    for date_format in START_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+def normalize_letter_fields(data):
+    """
+    Store salary as a number and start_date as an ISO date, in place
+    
+    A start_date that cannot be read as a date is dropped, since range
+    filters compare it as ISO text.
+    """
+    if "salary" in data:
+        data["salary"] = _as_number(data["salary"])
+    if "start_date" in data:
+        start_date = _as_iso_date(data["start_date"])
+        if start_date:
+            data["start_date"] = start_date
+        else:
+            del data["start_date"]
+    return data
+
+def stored_letter_data(user_data, letter_data=None):
+    """
+    Build the letter_data stored on a GeneratedLetter row
+    
+    Keeps the request's letter_data plus the letter fields the letter was
+    rendered with (position, department, salary, ...), so they can be
+    filtered on in the database. Salaries are stored as numbers when they
+    can be read as one, and start dates as ISO dates.
+    
+    Args:
+        user_data: Template context from build_letter_data
+        letter_data: Optional letter_data from the request
+    
+    Returns:
+        Dictionary, or None if there is nothing to store
+    """
+    data = dict(letter_data or {})
+    for field in STORED_LETTER_FIELDS:
+        if user_data.get(field) is not None:
+            data[field] = user_data[field]
+    return normalize_letter_fields(data) or None
 
 class LetterGenerator:
+    SUPPORTED_LETTER_TYPES = ("offer_letter", "appointment_letter", "confirmation_letter", "relieving_letter")
+    
     def __init__(self):
         self.pdf_generator = PDFGenerator()
     
@@ -42,3 +163,33 @@ class LetterGenerator:
             return generator(user_data, template_path)
         else:
             raise ValueError(f"Unsupported letter type: {letter_type}")
+    
+    async def generate_letter_async(self, letter_type, user_data, template_path=None):
+        """
+        Generate letter on the render engine without blocking the event loop
+        
+        Raises:
+            ValueError: If the letter type is not supported
+            RenderQueueFull: If the render engine has no free queue slots
+        """
+        if letter_type not in self.SUPPORTED_LETTER_TYPES:
+            raise ValueError(f"Unsupported letter type: {letter_type}")
+        return await get_render_engine().run(_generate_letter_in_worker, letter_type, user_data, template_path)
+    
+    def render_letter(self, letter_type, user_data, template_path=None):
+        """Render letter based on type in memory, returning a RenderedPDF"""
+        if letter_type not in self.SUPPORTED_LETTER_TYPES:
+            raise ValueError(f"Unsupported letter type: {letter_type}")
+        return self.pdf_generator.render_letter_pdf(letter_type, user_data, template_path)
+    
+    async def render_letter_async(self, letter_type, user_data, template_path=None):
+        """
+        Render letter in memory on the render engine without blocking the event loop
+        
+        Raises:
+            ValueError: If the letter type is not supported
+            RenderQueueFull: If the render engine has no free queue slots
+        """
+        if letter_type not in self.SUPPORTED_LETTER_TYPES:
+            raise ValueError(f"Unsupported letter type: {letter_type}")
+        return await get_render_engine().run(_render_letter_in_worker, letter_type, user_data, template_path)
@@ -0,0 +1,139 @@
+# Token-bucket send-rate scheduler for outbound email
+import time
+from config import Config
+
+def parse_rate_limits(value):
+    """
+    Parse per-domain limits written as "gmail.com=60,yahoo.com=20"
+    
+    Returns:
+        Dictionary of lower-cased domain to messages per minute
+    """
+    limits = {}
+    for item in (value or "").split(","):
+        domain, _, rate = item.partition("=")
+        if domain.strip() and rate.strip():
+            limits[domain.strip().lower()] = float(rate)
+    return limits
+
+class TokenBucket:
+    """
+    Token bucket holding up to capacity tokens, refilled at rate tokens per second
+    
+    A bucket with rate 0 is unlimited.
+    """
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+    
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self, now=None, tokens=1):
+        """Seconds until tokens are available (0 if they are available now)"""
+        if not self.rate:
+            return 0.0
+        self._refill(time.monotonic() if now is None else now)
+        return max(tokens - self.tokens, 0) / self.rate
+    
+    def consume(self, tokens=1):
+        if self.rate:
+            self.tokens -= tokens
+
+class SendRateScheduler:
+    """
+    Per-sender and per-recipient-domain send limits
+    
+    Every sender has a per-minute and a per-day bucket, and every recipient
+    domain a per-minute bucket (domain_limits overrides the default rate for
+    particular domains). A message may be sent only when all of its buckets
+    hold a token; otherwise reserve() reports how long to defer it. Limits of
+    0 disable the corresponding bucket.
+    """
+    
+    def __init__(self, sender_per_minute=None, sender_per_day=None, domain_per_minute=None,
+                 domain_limits=None):
+        self.sender_per_minute = (
+            Config.EMAIL_RATE_PER_MINUTE if sender_per_minute is None else sender_per_minute
+        )
+        self.sender_per_day = Config.EMAIL_RATE_PER_DAY if sender_per_day is None else sender_per_day
+        self.domain_per_minute = (
+            Config.EMAIL_DOMAIN_RATE_PER_MINUTE if domain_per_minute is None else domain_per_minute
+        )
+        self.domain_limits = (
+            parse_rate_limits(Config.EMAIL_DOMAIN_RATE_LIMITS) if domain_limits is None else domain_limits
+        )
+        self._buckets = {}
+        self._deferred = 0
+    
+    @staticmethod
+    def domain_of(recipient_email):
+        return recipient_email.rpartition("@")[2].lower()
+    
+    def _bucket(self, key, per_period, period):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            # Burst up to a full period's quota, refilled evenly over the period
+            bucket = self._buckets[key] = TokenBucket(per_period / period, per_period)
+        return bucket
+    
+    def _sender_buckets(self, sender_email):
+        return [
+            self._bucket(("sender_minute", sender_email), self.sender_per_minute, 60),
+            self._bucket(("sender_day", sender_email), self.sender_per_day, 86400)
+        ]
+    
+    def _domain_bucket(self, domain):
+        return self._bucket(("domain", domain), self.domain_limits.get(domain, self.domain_per_minute), 60)
+    
+    def reserve(self, sender_email, recipient_email):
+        """
+        Take a send slot for a message if every limit allows it
+        
+        Returns:
+            0 if the message may be sent now, otherwise the number of seconds
+            to defer it by (no tokens are taken in that case)
+        """
+        now = time.monotonic()
+        buckets = self._sender_buckets(sender_email) + [self._domain_bucket(self.domain_of(recipient_email))]
+        delay = max(bucket.wait_time(now) for bucket in buckets)
+        if delay > 0:
+            self._deferred += 1
+            return delay
+        for bucket in buckets:
+            bucket.consume()
+        return 0.0
+    
+    def estimate_drain(self, sender_email, domain_counts):
+        """
+        Estimate seconds needed to send a queue under the current limits
+        
+        Args:
+            sender_email: Sender the queued messages go out from
+            domain_counts: Dictionary of recipient domain to queued message count
+        
+        Returns:
+            Seconds until the slowest limit has let the whole queue through
+        """
+        now = time.monotonic()
+        total = sum(domain_counts.values())
+        estimates = [0.0]
+        if total:
+            estimates.extend(bucket.wait_time(now, total) for bucket in self._sender_buckets(sender_email))
+        for domain, count in domain_counts.items():
+            estimates.append(self._domain_bucket(domain).wait_time(now, count))
+        return max(estimates)
+    
+    def stats(self):
+        """Get the configured limits and the number of deferrals so far"""
+        return {
+            "sender_per_minute": self.sender_per_minute,
+            "sender_per_day": self.sender_per_day,
+            "domain_per_minute": self.domain_per_minute,
+            "domain_limits": dict(self.domain_limits),
+            "deferred": self._deferred
+        }
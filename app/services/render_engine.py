@@ -0,0 +1,115 @@
+# Render engine for running CPU-bound PDF generation off the event loop
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from config import Config
+
+class RenderQueueFull(Exception):
+    """Raised when the render engine already holds the maximum number of pending renders"""
+    pass
+
+def _warm_worker(template_dir):
+    """Initializer for worker processes: pre-load templates, stylesheets and fonts"""
+    from app.utils.pdf_generator import warm_caches
+    try:
+        warm_caches(template_dir)
+    except Exception as e:
+        print(f"Error warming render worker: {e}")
+
+def _noop():
+    return None
+
+class RenderEngine:
+    """
+    Process pool that renders letters without blocking the event loop
+    
+    Routes await RenderEngine.run(), which submits the render to a worker
+    process and returns its result. At most max_queue renders may be pending
+    (queued or running) at once; further submissions raise RenderQueueFull so
+    the caller can shed load instead of growing an unbounded backlog.
+    
+    With max_workers=0 renders run in the event loop's default thread pool
+    instead of separate processes.
+    """
+    
+    def __init__(self, max_workers=None, max_queue=None, template_dir="app/templates",
+                 start_method=None):
+        self.max_workers = Config.RENDER_WORKERS if max_workers is None else max_workers
+        self.max_queue = Config.RENDER_MAX_QUEUE if max_queue is None else max_queue
+        self.template_dir = template_dir
+        self.start_method = start_method or Config.RENDER_START_METHOD
+        self._executor = None
+        self._pending = 0
+    
+    def start(self):
+        """Create the worker pool and pre-warm every worker"""
+        if self._executor is None and self.max_workers > 0:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context(self.start_method),
+                initializer=_warm_worker,
+                initargs=(self.template_dir,)
+            )
+            # Workers are spawned on demand; one no-op per worker brings them all up now
+            for _ in range(self.max_workers):
+                self._executor.submit(_noop)
+        return self._executor
+    
+    async def run(self, func, *args):
+        """
+        Run func(*args) on the pool and await its result
+        
+        Args:
+            func: Picklable module-level function to execute
+            *args: Picklable arguments for func
+            
+        Returns:
+            Return value of func
+            
+        Raises:
+            RenderQueueFull: If max_queue renders are already pending
+        """
+        if self._pending >= self.max_queue:
+            raise RenderQueueFull(f"Render queue is full ({self.max_queue} pending renders)")
+        
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.start(), func, *args)
+        finally:
+            self._pending -= 1
+    
+    def available_slots(self):
+        """Number of renders that can be submitted before the queue is full"""
+        return max(self.max_queue - self._pending, 0)
+    
+    def stats(self):
+        """Get current pool size and queue depth"""
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "started": self._executor is not None
+        }
+    
+    def shutdown(self, wait=True):
+        """Stop the worker pool, cancelling renders that have not started yet"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+_render_engine = None
+
+def get_render_engine():
+    """Get the process-wide render engine"""
+    global _render_engine
+    if _render_engine is None:
+        _render_engine = RenderEngine()
+    return _render_engine
+
+def shutdown_render_engine(wait=True):
+    """Shut down the process-wide render engine, if it was created"""
+    global _render_engine
+    if _render_engine is not None:
+        _render_engine.shutdown(wait=wait)
+        _render_engine = None
@@ -0,0 +1,259 @@
+# Incrementally maintained dashboard statistics with a short-lived cache
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import delete, event, func, inspect, insert, literal, select, update
+from sqlalchemy.orm import Session
+from config import Config
+from app.models.user import User
+from app.models.letter import GeneratedLetter
+from app.models.template import LetterTemplate
+from app.models.email_log import EmailLog
+from app.models.stats import StatCounter, DailyStat
+from app.schemas import LetterResponse
+
+# Counters that also get a per-day rollup; status counters are running totals only
+DAILY_PREFIXES = ("users", "letters", "emails.")
+DEFAULT_DAILY_METRICS = ["letters", "users", "emails.sent", "emails.failed"]
+
+def _letter_keys(letter_type, status):
+    return ["letters", f"letters.type.{letter_type}", f"letters.status.{status or 'generated'}"]
+
+def _row_keys(model, values):
+    """Counter names a row of a tracked model contributes to, from its column values"""
+    if model is User:
+        return ["users"]
+    if model is LetterTemplate:
+        return ["templates"]
+    if model is GeneratedLetter:
+        return _letter_keys(values.get("letter_type"), values.get("status"))
+    if model is EmailLog:
+        return [f"emails.{values.get('status') or 'sent'}"]
+    return []
+
+def _is_daily(name):
+    return name.startswith(DAILY_PREFIXES) and not name.startswith("letters.status.")
+
+def _instance_values(instance):
+    return {"letter_type": getattr(instance, "letter_type", None), "status": getattr(instance, "status", None)}
+
+def _increment(connection, table, key, delta):
+    """Add delta to a counter row, creating it if it does not exist"""
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        statement = upsert(table).values(**key, value=delta)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(key), set_={"value": table.c.value + statement.excluded.value}
+        )
+        connection.execute(statement)
+        return
+    
+    conditions = [table.c[column] == value for column, value in key.items()]
+    result = connection.execute(update(table).where(*conditions).values(value=table.c.value + delta))
+    if result.rowcount == 0:
+        connection.execute(insert(table).values(**key, value=delta))
+
+def apply_deltas(connection, deltas, day=None):
+    """
+    Add counter deltas, and the daily rollups of inserted rows, in the caller's transaction
+    
+    Args:
+        connection: Connection of the transaction writing the rows
+        deltas: Mapping of counter name to change
+        day: Day the rollups are recorded for (defaults to today, UTC)
+    """
+    day = day or datetime.utcnow().date()
+    for name, delta in sorted(deltas.items()):
+        if not delta:
+            continue
+        _increment(connection, StatCounter.__table__, {"name": name}, delta)
+        if delta > 0 and _is_daily(name):
+            _increment(connection, DailyStat.__table__, {"day": day, "metric": name}, delta)
+
+TRACKED_MODELS = (User, LetterTemplate, GeneratedLetter, EmailLog)
+
+@event.listens_for(Session, "before_flush")
+def _track_flush(session, flush_context, instances):
+    """
+    Count rows a unit-of-work flush inserts, deletes or moves between statuses
+    
+    The counters are written on the flush's connection, so they commit or
+    roll back together with the rows. Deleted rows are read before the
+    flush, while their values can still be loaded.
+    """
+    deltas = Counter()
+    for instance in session.new:
+        if isinstance(instance, TRACKED_MODELS):
+            deltas.update(_row_keys(type(instance), _instance_values(instance)))
+    for instance in session.deleted:
+        if isinstance(instance, TRACKED_MODELS):
+            deltas.subtract(_row_keys(type(instance), _instance_values(instance)))
+    for instance in session.dirty:
+        if isinstance(instance, GeneratedLetter):
+            history = inspect(instance).attrs.status.history
+            if history.added and history.deleted:
+                deltas[f"letters.status.{history.deleted[0] or 'generated'}"] -= 1
+                deltas[f"letters.status.{history.added[0] or 'generated'}"] += 1
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk_insert(orm_execute_state):
+    """Count rows of tracked models written by session.execute(insert(Model), rows)"""
+    if not orm_execute_state.is_insert or orm_execute_state.bind_mapper is None:
+        return
+    model = orm_execute_state.bind_mapper.class_
+    rows = orm_execute_state.parameters
+    if model not in TRACKED_MODELS or not rows:
+        return
+    if isinstance(rows, dict):
+        rows = [rows]
+    
+    deltas = Counter()
+    for values in rows:
+        deltas.update(_row_keys(model, values))
+    apply_deltas(orm_execute_state.session.connection(), deltas)
+
+def rebuild_stats(connection):
+    """
+    Recompute every counter and daily rollup from the tables
+    
+    Used once by the migration that introduces them; afterwards they are
+    kept up to date as rows are written.
+    """
+    counters = StatCounter.__table__
+    daily = DailyStat.__table__
+    connection.execute(delete(counters))
+    connection.execute(delete(daily))
+    
+    totals = [
+        (literal("users"), User, None),
+        (literal("templates"), LetterTemplate, None),
+        (literal("letters"), GeneratedLetter, None),
+        (literal("letters.type.") + GeneratedLetter.letter_type, GeneratedLetter, GeneratedLetter.letter_type),
+        (literal("letters.status.") + func.coalesce(GeneratedLetter.status, "generated"), GeneratedLetter,
+         func.coalesce(GeneratedLetter.status, "generated")),
+        (literal("emails.") + EmailLog.status, EmailLog, EmailLog.status)
+    ]
+    for name, model, group in totals:
+        query = select(name, func.count()).select_from(model)
+        if group is not None:
+            query = query.where(group.is_not(None)).group_by(group)
+        connection.execute(insert(counters).from_select(["name", "value"], query))
+    
+    rollups = [
+        (literal("users"), User.created_at, None),
+        (literal("letters"), GeneratedLetter.generated_at, None),
+        (literal("letters.type.") + GeneratedLetter.letter_type, GeneratedLetter.generated_at,
+         GeneratedLetter.letter_type),
+        (literal("emails.") + EmailLog.status, EmailLog.sent_at, EmailLog.status)
+    ]
+    for name, stamp, group in rollups:
+        day = func.date(stamp)
+        groups = [day] if group is None else [day, group]
+        query = select(day, name, func.count()).where(*[column.is_not(None) for column in [stamp, *groups[1:]]])
+        connection.execute(insert(daily).from_select(["day", "metric", "value"], query.group_by(*groups)))
+
+class TTLCache:
+    """Small thread-safe cache whose entries expire ttl seconds after they are stored"""
+    
+    def __init__(self, ttl, max_entries=64):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self._entries.pop(key, None)
+                return None
+            return entry[1]
+    
+    def set(self, key, value):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+_stats_cache = TTLCache(Config.STATS_CACHE_TTL)
+
+def get_dashboard_stats(db):
+    """
+    Get the admin dashboard statistics
+    
+    Totals come from the maintained counters and the recent letters from
+    the generated_at index, so the cost does not grow with the tables.
+    Results are cached for STATS_CACHE_TTL seconds.
+    """
+    stats = _stats_cache.get("dashboard")
+    if stats is not None:
+        return stats
+    
+    counters = dict(db.execute(select(StatCounter.name, StatCounter.value)).all())
+    recent_letters = db.execute(
+        select(GeneratedLetter).order_by(GeneratedLetter.generated_at.desc()).limit(5)
+    ).scalars().all()
+    
+    def grouped(prefix):
+        return {name[len(prefix):]: value for name, value in counters.items() if name.startswith(prefix) and value}
+    
+    stats = {
+        "total_users": counters.get("users", 0),
+        "total_letters": counters.get("letters", 0),
+        "total_templates": counters.get("templates", 0),
+        "letters_by_type": grouped("letters.type."),
+        "letters_by_status": grouped("letters.status."),
+        "emails_sent": counters.get("emails.sent", 0),
+        "emails_failed": counters.get("emails.failed", 0),
+        "recent_letters": [
+            LetterResponse.model_validate(letter).model_dump(mode="json") for letter in recent_letters
+        ]
+    }
+    _stats_cache.set("dashboard", stats)
+    return stats
+
+def get_daily_stats(db, days=30, metrics=None):
+    """
+    Get per-day series of the rolled-up metrics for charting
+    
+    Args:
+        db: Database session
+        days: Number of days up to and including today (UTC)
+        metrics: Metric names (defaults to letters, users, emails.sent and emails.failed)
+    
+    Returns:
+        Dictionary with the list of days and one zero-filled series per metric
+    """
+    metrics = tuple(metrics or DEFAULT_DAILY_METRICS)
+    cache_key = ("daily", days, metrics)
+    series = _stats_cache.get(cache_key)
+    if series is not None:
+        return series
+    
+    today = datetime.utcnow().date()
+    day_list = [today - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+    rows = db.execute(
+        select(DailyStat.day, DailyStat.metric, DailyStat.value).where(
+            DailyStat.day >= day_list[0],
+            DailyStat.metric.in_(metrics)
+        )
+    ).all()
+    values = {(row.day, row.metric): row.value for row in rows}
+    
+    series = {
+        "days": [day.isoformat() for day in day_list],
+        "series": {metric: [values.get((day, metric), 0) for day in day_list] for metric in metrics}
+    }
+    _stats_cache.set(cache_key, series)
+    return series
@@ -0,0 +1,381 @@
+# Bulk user import from streamed CSV or JSON Lines uploads
+import asyncio
+import codecs
+import csv
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pydantic import ValidationError
+from sqlalchemy import insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from app.auth import hash_passwords
+from app.models.user import User
+from app.schemas import UserCreate, LetterCreate
+from app.services.batch_generator import BatchLetterGenerator
+from app.services.email_service import EmailService
+from app.services.email_outbox import get_email_dispatcher
+from app.services.letter_generator import build_letter_data, stored_letter_data
+from config import Config
+
+IMPORT_FORMATS = ("csv", "jsonl")
+CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "jsonl",
+    "application/jsonl": "jsonl",
+    "application/x-jsonlines": "jsonl"
+}
+
+# Columns that must be unique across users; a row repeating one is a duplicate
+UNIQUE_FIELDS = ("username", "email", "employee_id")
+
+class ImportFormatError(ValueError):
+    """Raised when an upload cannot be read as the declared format"""
+
+def format_from_content_type(content_type):
+    """Import format for a request Content-Type, or None if it is not a known one"""
+    return CONTENT_TYPES.get((content_type or "").split(";")[0].strip().lower())
+
+async def _lines(chunks):
+    """Decode a stream of byte chunks into lines, each ending with its newline"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    try:
+        async for chunk in chunks:
+            # The last piece may be a line cut off by the chunk boundary
+            *lines, pending = (pending + decoder.decode(chunk)).split("\n")
+            for line in lines:
+                yield line + "\n"
+        pending += decoder.decode(b"", final=True)
+    except UnicodeDecodeError as e:
+        raise ImportFormatError(f"Upload is not valid UTF-8: {e}")
+    if pending:
+        yield pending
+
+async def _csv_records(lines):
+    """Yield (row, values or error) for each data row of a CSV file with a header row"""
+    header = None
+    record = ""
+    row = 0
+    async for line in lines:
+        record += line
+        # A quoted field may span lines; the record is complete once its quotes balance
+        if record.count('"') % 2:
+            continue
+        text, record = record, ""
+        if not text.strip():
+            continue
+        try:
+            values = next(csv.reader([text]))
+        except csv.Error as e:
+            if header is None:
+                raise ImportFormatError(f"Unreadable CSV header: {e}")
+            row += 1
+            yield row, f"Malformed CSV row: {e}"
+            continue
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            continue
+        
+        row += 1
+        if len(values) != len(header):
+            yield row, f"Expected {len(header)} columns, got {len(values)}"
+        else:
+            # A blank cell leaves the field unset, so optional fields get their defaults
+            yield row, {name: value.strip() for name, value in zip(header, values) if value.strip()}
+    
+    if record.strip():
+        yield row + 1, "Unterminated quoted field"
+
+async def _jsonl_records(lines):
+    """Yield (row, values or error) for each non-blank line of a JSON Lines file"""
+    row = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            values = json.loads(line)
+        except ValueError as e:
+            yield row, f"Invalid JSON: {e}"
+            continue
+        yield row, values if isinstance(values, dict) else "Expected a JSON object"
+
+def _validation_message(error):
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}" for detail in error.errors()
+    )
+
+_hash_pool = None
+
+def get_hash_pool():
+    """Get the process pool for password hashing, or None to hash on the default thread pool"""
+    global _hash_pool
+    if _hash_pool is None and Config.PASSWORD_HASH_WORKERS > 0:
+        _hash_pool = ProcessPoolExecutor(
+            max_workers=Config.PASSWORD_HASH_WORKERS,
+            mp_context=multiprocessing.get_context(Config.RENDER_START_METHOD)
+        )
+    return _hash_pool
+
+def shutdown_hash_pool(wait=True):
+    """Shut down the password hashing pool, if it was started"""
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=wait, cancel_futures=True)
+        _hash_pool = None
+
+async def hash_passwords_parallel(passwords):
+    """
+    Hash passwords off the event loop, one slice per hashing worker
+    
+    bcrypt is deliberately slow, so a batch is split across the worker
+    processes rather than hashed one after another.
+    
+    Returns:
+        List of hashes in the order of the passwords
+    """
+    if not passwords:
+        return []
+    workers = max(Config.PASSWORD_HASH_WORKERS, 1)
+    size = -(-len(passwords) // workers)
+    loop = asyncio.get_running_loop()
+    slices = await asyncio.gather(*[
+        loop.run_in_executor(get_hash_pool(), hash_passwords, passwords[start:start + size])
+        for start in range(0, len(passwords), size)
+    ])
+    return [password_hash for hashes in slices for password_hash in hashes]
+
+class UserImporter:
+    """
+    Create users in bulk from an uploaded CSV or JSON Lines file
+    
+    The upload is read as it streams in and handled batch_size rows at a
+    time: rows are validated, checked for duplicates against the rest of the
+    file and, with one query per batch, against existing users, then their
+    passwords are hashed on the hashing pool and the new users are inserted
+    in a single statement. Each batch commits on its own, so a failure part
+    way through keeps the rows imported before it.
+    
+    With send_email, a credentials email is queued for every created user;
+    with welcome_letter_type, a welcome letter is generated for them too and
+    attached to that email.
+    """
+    
+    def __init__(self, db, created_by, send_email=True, welcome_letter_type=None, batch_size=None):
+        self.db = db
+        self.created_by = created_by
+        self.send_email = send_email
+        self.welcome_letter_type = welcome_letter_type
+        self.batch_size = batch_size or Config.USER_IMPORT_BATCH_SIZE
+        self.rows = []
+        self.emails_queued = 0
+        self._seen = {field: set() for field in UNIQUE_FIELDS}
+    
+    def _report(self, row, values, status, error=None, user_id=None):
+        entry = {
+            "row": row,
+            "username": values.get("username") if isinstance(values, dict) else None,
+            "status": status,
+            "user_id": user_id,
+            "error": error
+        }
+        if self.welcome_letter_type:
+            entry["letter_id"] = None
+        self.rows.append(entry)
+        return entry
+    
+    def _check_file_duplicates(self, candidates):
+        """Report rows repeating a unique value of an earlier row, and return the rest"""
+        unique = []
+        for row, user in candidates:
+            repeated = next(
+                (field for field in UNIQUE_FIELDS
+                 if getattr(user, field) is not None and getattr(user, field) in self._seen[field]),
+                None
+            )
+            if repeated:
+                self._report(row, user.model_dump(), "duplicate", f"Duplicate {repeated} in file")
+                continue
+            for field in UNIQUE_FIELDS:
+                if getattr(user, field) is not None:
+                    self._seen[field].add(getattr(user, field))
+            unique.append((row, user))
+        return unique
+    
+    async def _check_existing(self, candidates):
+        """Report rows matching an existing user, found with one query for the batch, and return the rest"""
+        conditions = []
+        for field in UNIQUE_FIELDS:
+            values = {getattr(user, field) for _, user in candidates if getattr(user, field) is not None}
+            if values:
+                conditions.append(getattr(User, field).in_(values))
+        if not conditions:
+            return candidates
+        
+        result = await self.db.execute(select(User.username, User.email, User.employee_id).where(or_(*conditions)))
+        existing = {field: set() for field in UNIQUE_FIELDS}
+        for match in result.all():
+            for field in UNIQUE_FIELDS:
+                existing[field].add(getattr(match, field))
+        
+        remaining = []
+        for row, user in candidates:
+            taken = next(
+                (field for field in UNIQUE_FIELDS
+                 if getattr(user, field) is not None and getattr(user, field) in existing[field]),
+                None
+            )
+            if taken:
+                message = f"{taken.replace('_', ' ').capitalize()} already registered"
+                self._report(row, user.model_dump(), "duplicate", message)
+            else:
+                remaining.append((row, user))
+        return remaining
+    
+    def _queue_credentials(self, db, user, letter_pdf_path=None, letter_id=None):
+        EmailService(db).queue_user_credentials(
+            user.email,
+            user.username,
+            user.password,
+            user.full_name,
+            letter_pdf_path,
+            self.welcome_letter_type if letter_id else None,
+            letter_id
+        )
+        self.emails_queued += 1
+    
+    async def _insert(self, candidates, hashes):
+        """Insert the batch in one statement; returns the new ids, or None if the insert was refused"""
+        rows = [
+            {**user.model_dump(exclude={"password"}), "password_hash": password_hash}
+            for (_, user), password_hash in zip(candidates, hashes)
+        ]
+        try:
+            result = await self.db.execute(insert(User).returning(User.id, sort_by_parameter_order=True), rows)
+            user_ids = result.scalars().all()
+            # Without a welcome letter the credentials emails commit together with the users
+            if self.send_email and not self.welcome_letter_type:
+                for _, user in candidates:
+                    self._queue_credentials(self.db, user)
+            await self.db.commit()
+            return user_ids
+        except IntegrityError:
+            # A user created since the duplicate check; insert the batch row by row instead
+            await self.db.rollback()
+            return None
+    
+    async def _insert_one_by_one(self, candidates, hashes):
+        user_ids = []
+        for (row, user), password_hash in zip(candidates, hashes):
+            user_id = await self._insert([(row, user)], [password_hash])
+            if user_id is None:
+                self._report(row, user.model_dump(), "duplicate", "Username, email or employee ID already registered")
+            user_ids.append(user_id[0] if user_id else None)
+        return user_ids
+    
+    async def _generate_letters(self, created):
+        """Generate welcome letters for a batch of new users and queue their emails with them attached"""
+        items = []
+        for index, (entry, user) in enumerate(created):
+            db_user = User(id=entry["user_id"], **user.model_dump(exclude={"password"}))
+            user_data = build_letter_data(
+                db_user, LetterCreate(user_id=db_user.id, letter_type=self.welcome_letter_type)
+            )
+            items.append({
+                "index": index,
+                "user_id": db_user.id,
+                "letter_type": self.welcome_letter_type,
+                "letter_data": stored_letter_data(user_data),
+                "user_data": user_data
+            })
+        
+        def on_insert(db, inserted):
+            # Each letter commits together with the email it is attached to
+            if self.send_email:
+                for item, db_letter in inserted:
+                    self._queue_credentials(db, created[item["index"]][1], db_letter.pdf_path, db_letter.id)
+        
+        failed = []
+        batch_generator = BatchLetterGenerator(self.created_by, on_insert=on_insert)
+        async for event in batch_generator.generate(items):
+            if event["event"] != "item":
+                continue
+            entry, user = created[event["index"]]
+            if event["status"] == "generated":
+                entry["letter_id"] = event["letter_id"]
+            else:
+                entry["error"] = f"Welcome letter failed: {event['error']}"
+                failed.append(user)
+        
+        # Users whose letter failed still get their credentials
+        if self.send_email and failed:
+            for user in failed:
+                self._queue_credentials(self.db, user)
+            await self.db.commit()
+    
+    async def _import_batch(self, batch):
+        candidates = []
+        for row, values in batch:
+            if isinstance(values, str):
+                self._report(row, None, "invalid", values)
+                continue
+            try:
+                # A null field is treated as missing, so it falls back to its default
+                fields = {name: value for name, value in values.items() if value is not None}
+                candidates.append((row, UserCreate(**fields)))
+            except ValidationError as e:
+                self._report(row, values, "invalid", _validation_message(e))
+        
+        candidates = self._check_file_duplicates(candidates)
+        if candidates:
+            candidates = await self._check_existing(candidates)
+        if not candidates:
+            return
+        
+        hashes = await hash_passwords_parallel([user.password for _, user in candidates])
+        user_ids = await self._insert(candidates, hashes)
+        if user_ids is None:
+            user_ids = await self._insert_one_by_one(candidates, hashes)
+        
+        created = [
+            (self._report(row, user.model_dump(), "created", user_id=user_id), user)
+            for (row, user), user_id in zip(candidates, user_ids) if user_id is not None
+        ]
+        if created and self.welcome_letter_type:
+            await self._generate_letters(created)
+    
+    async def run(self, chunks, file_format):
+        """
+        Import every row of an upload
+        
+        Args:
+            chunks: Async iterator of the upload's raw bytes
+            file_format: "csv" (with a header row) or "jsonl" (one JSON object per line)
+        
+        Returns:
+            Report with the counts per status and one entry per row, in file order
+        """
+        records = _csv_records(_lines(chunks)) if file_format == "csv" else _jsonl_records(_lines(chunks))
+        error = None
+        batch = []
+        try:
+            async for record in records:
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    await self._import_batch(batch)
+                    batch = []
+            if batch:
+                await self._import_batch(batch)
+        except ImportFormatError as e:
+            # Rows of earlier batches are already imported and stay in the report
+            error = str(e)
+        
+        if self.emails_queued:
+            get_email_dispatcher().notify()
+        
+        rows = sorted(self.rows, key=lambda entry: entry["row"])
+        counts = {status: 0 for status in ("created", "duplicate", "invalid")}
+        for entry in rows:
+            counts[entry["status"]] += 1
+        return {"total": len(rows), **counts, "emails_queued": self.emails_queued, "error": error, "rows": rows}
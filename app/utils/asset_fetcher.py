@@ -0,0 +1,160 @@
+# Cached fetching of images, fonts and stylesheets referenced by letter templates
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+from weasyprint.urls import URLFetcher, URLFetcherResponse
+from config import Config
+
+# Assets templates can reference as asset://<name>
+LETTER_ASSETS = {
+    "logo": Config.LETTER_LOGO_PATH,
+}
+
+# Decoded images are dropped once this many URLs have been cached
+IMAGE_CACHE_MAX_ENTRIES = 256
+
+class AssetCache:
+    """
+    LRU cache of asset file contents
+    
+    Entries are keyed by resolved path and mtime, so an edited asset is read
+    again automatically. The total size of cached content is capped at
+    max_bytes; files larger than that are never cached.
+    """
+    
+    def __init__(self, max_bytes=None):
+        self.max_bytes = Config.ASSET_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+    
+    def get(self, path):
+        """
+        Get the content and MIME type of the file at path
+        
+        Raises:
+            OSError: If the file cannot be read
+        """
+        real_path = os.path.realpath(path)
+        key = (real_path, os.stat(real_path).st_mtime_ns)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry
+        
+        with open(real_path, 'rb') as file:
+            data = file.read()
+        entry = (data, mimetypes.guess_type(real_path)[0] or 'application/octet-stream')
+        
+        with self._lock:
+            self._misses += 1
+            if len(data) <= self.max_bytes:
+                # Drop entries for older versions of the same file
+                for stale_key in [k for k in self._entries if k[0] == real_path]:
+                    self._size -= len(self._entries.pop(stale_key)[0])
+                self._entries[key] = entry
+                self._size += len(data)
+                while self._size > self.max_bytes:
+                    _, (evicted, _) = self._entries.popitem(last=False)
+                    self._size -= len(evicted)
+        return entry
+    
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "hits": self._hits,
+                "misses": self._misses
+            }
+
+_asset_cache = AssetCache()
+_image_cache = {}
+_image_cache_version = None
+_image_cache_lock = threading.Lock()
+
+def get_asset_cache():
+    """Get the process-wide asset cache"""
+    return _asset_cache
+
+def resolve_asset_path(url):
+    """
+    Map an asset:// or file:// URL to a local path
+    
+    Returns:
+        The local path, or None for other URL schemes
+    
+    Raises:
+        ValueError: If an asset:// name is not registered in LETTER_ASSETS
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == 'asset':
+        name = parsed.netloc or parsed.path.lstrip('/')
+        if name not in LETTER_ASSETS:
+            raise ValueError(f"Unknown letter asset: {name}")
+        return LETTER_ASSETS[name]
+    if parsed.scheme == 'file':
+        return url2pathname(parsed.path)
+    return None
+
+def get_assets_version():
+    """Version string covering every registered asset, changing when any of them is modified"""
+    versions = []
+    for name in sorted(LETTER_ASSETS):
+        try:
+            versions.append(f"{name}={os.stat(LETTER_ASSETS[name]).st_mtime_ns}")
+        except OSError:
+            versions.append(f"{name}=-")
+    return ",".join(versions)
+
+def get_image_cache():
+    """
+    Get the process-wide WeasyPrint image cache
+    
+    WeasyPrint keys decoded images by URL, so the cache is reset whenever a
+    registered asset changes (or it grows too large) to avoid reusing stale
+    images for the same asset:// URL.
+    """
+    global _image_cache, _image_cache_version
+    version = get_assets_version()
+    with _image_cache_lock:
+        if version != _image_cache_version or len(_image_cache) > IMAGE_CACHE_MAX_ENTRIES:
+            _image_cache = {}
+            _image_cache_version = version
+        return _image_cache
+
+def preload_assets():
+    """Read every registered asset into the cache"""
+    for name, path in LETTER_ASSETS.items():
+        try:
+            _asset_cache.get(path)
+        except OSError as e:
+            print(f"Error preloading letter asset {name}: {e}")
+
+class AssetFetcher(URLFetcher):
+    """
+    WeasyPrint URL fetcher that serves local assets from the asset cache
+    
+    Handles asset://<name> URLs for the assets registered in LETTER_ASSETS
+    and file:// URLs; any other URL is fetched by WeasyPrint's default
+    fetcher.
+    """
+    
+    def __init__(self, cache=None, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache or _asset_cache
+    
+    def fetch(self, url, headers=None):
+        path = resolve_asset_path(url)
+        if path is None:
+            return super().fetch(url, headers)
+        
+        data, mime_type = self.cache.get(path)
+        return URLFetcherResponse(url, body=data, headers={"Content-Type": mime_type})
@@ -0,0 +1,62 @@
+# SQL expressions for fields inside JSON columns that expression indexes can match
+import re
+from sqlalchemy import Numeric, String
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ColumnElement
+from sqlalchemy.sql.visitors import InternalTraversal
+
+_KEY_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+class json_field(ColumnElement):
+    """
+    A top-level key of a JSON column, as text or as a number
+    
+    The key is rendered as a literal rather than a bound parameter, so the
+    same expression in an Index and in a query compiles to identical SQL and
+    SQLite and PostgreSQL use the expression index for it. A numeric field is
+    NULL for rows where the value is not a JSON number, so comparisons never
+    mix numbers with strings.
+    
+    Args:
+        column: JSON column
+        key: Key to read (letters, digits and underscores)
+        numeric: Read the value as a number instead of text
+    """
+    
+    inherit_cache = True
+    _traverse_internals = [
+        ("column", InternalTraversal.dp_clauseelement),
+        ("key", InternalTraversal.dp_string),
+        ("numeric", InternalTraversal.dp_boolean)
+    ]
+    
+    def __init__(self, column, key, numeric=False):
+        if not _KEY_PATTERN.match(key):
+            raise ValueError(f"Unsupported JSON key: {key!r}")
+        self.column = column
+        self.key = key
+        self.numeric = numeric
+        self.type = Numeric(asdecimal=False) if numeric else String()
+
+@compiles(json_field, "sqlite")
+def _compile_sqlite(element, compiler, **kw):
+    column = compiler.process(element.column, **kw)
+    path = f"'$.{element.key}'"
+    if element.numeric:
+        return (f"(CASE json_type({column}, {path}) WHEN 'integer' THEN json_extract({column}, {path}) "
+                f"WHEN 'real' THEN json_extract({column}, {path}) END)")
+    return f"json_extract({column}, {path})"
+
+@compiles(json_field, "postgresql")
+def _compile_postgresql(element, compiler, **kw):
+    column = compiler.process(element.column, **kw)
+    key = f"'{element.key}'"
+    if element.numeric:
+        return f"(CASE jsonb_typeof({column} -> {key}) WHEN 'number' THEN ({column} ->> {key})::numeric END)"
+    return f"({column} ->> {key})"
+
+@compiles(json_field)
+def _compile_default(element, compiler, **kw):
+    # Other databases get SQLAlchemy's generic JSON access, without index matching
+    value = element.column[element.key]
+    return compiler.process(value.as_float() if element.numeric else value.as_string(), **kw)
@@ -0,0 +1,139 @@
+# Keyset (cursor) pagination for listing endpoints
+import base64
+import binascii
+import json
+from datetime import datetime
+from sqlalchemy import DateTime, String, func, select, text, tuple_, type_coerce
+from config import Config
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor is malformed or belongs to another listing"""
+
+def encode_cursor(scope, values):
+    """
+    Encode the sort key of the last row on a page as an opaque cursor
+    
+    Args:
+        scope: Name of the listing the cursor belongs to
+        values: Sort key values of the last row, in sort column order
+    
+    Returns:
+        URL-safe cursor string
+    """
+    payload = {"s": scope, "v": [value.isoformat() if isinstance(value, datetime) else value for value in values]}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(scope, cursor, columns):
+    """
+    Decode a cursor from encode_cursor back into sort key values
+    
+    Raises:
+        InvalidCursor: If the cursor cannot be decoded or was issued by another listing
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = payload["v"]
+        if payload["s"] != scope or len(values) != len(columns):
+            raise InvalidCursor("Cursor does not belong to this listing")
+        return [
+            datetime.fromisoformat(value) if isinstance(column.type, DateTime) else value
+            for column, value in zip(columns, values)
+        ]
+    except InvalidCursor:
+        raise
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {e}")
+
+def apply_keyset(query, columns, after=None, descending=False):
+    """
+    Order a select by the sort columns and start it after a given sort key
+    
+    The columns must end with a unique column (the primary key) so the
+    order is total; with an index on the same columns each page is a single
+    index range scan, however deep it is.
+    """
+    if after is not None:
+        key = tuple_(*columns) if len(columns) > 1 else columns[0]
+        bound = tuple_(*after) if len(columns) > 1 else after[0]
+        query = query.where(key < bound if descending else key > bound)
+    return query.order_by(*[column.desc() if descending else column.asc() for column in columns])
+
+def _sort_keys(columns, dialect_name):
+    """
+    Sort key expressions for the columns on the given database
+    
+    SQLite keeps datetimes as text, and rows stamped by func.now() have no
+    microseconds while bound datetimes always do, so the same instant would
+    compare unequal. There the stored text itself is the key; the expression
+    still renders as the bare column, so indexes on it apply.
+    """
+    if dialect_name != "sqlite":
+        return list(columns)
+    return [type_coerce(column, String) if isinstance(column.type, DateTime) else column for column in columns]
+
+async def fetch_page(db, query, columns, scope, limit, cursor=None, descending=False):
+    """
+    Fetch one page of a keyset-paginated select
+    
+    Args:
+        db: Async database session
+        query: Select of a single entity, filters applied, unordered
+        columns: Sort columns, ending with the primary key
+        scope: Name of the listing, embedded in its cursors
+        limit: Page size
+        cursor: Cursor returned with the previous page, or None for the first page
+        descending: Sort newest/highest first
+    
+    Returns:
+        Tuple of (rows, next_cursor); next_cursor is None on the last page
+    """
+    keys = _sort_keys(columns, db.bind.dialect.name)
+    after = decode_cursor(scope, cursor, keys) if cursor else None
+    query = query.add_columns(*[key.label(f"_cursor_{index}") for index, key in enumerate(keys)])
+    result = await db.execute(apply_keyset(query, keys, after, descending).limit(limit + 1))
+    rows = result.all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(scope, list(rows[-1][1:]))
+    return [row[0] for row in rows], next_cursor
+
+async def estimate_count(db, query, table, cap=None):
+    """
+    Count the rows of a select, exactly up to cap and estimated beyond it
+    
+    The exact count stops after cap + 1 rows, so its cost is bounded. Past
+    that an unfiltered listing is estimated from the table (PostgreSQL's
+    planner statistics, or the highest id elsewhere); a filtered one reports
+    cap as a lower bound.
+    
+    Returns:
+        Tuple of (count, exact)
+    """
+    cap = cap or Config.PAGINATION_COUNT_CAP
+    bounded = query.order_by(None).limit(cap + 1).subquery()
+    count = await db.scalar(select(func.count()).select_from(bounded))
+    if count <= cap:
+        return count, True
+    if query.whereclause is not None:
+        return cap, False
+    
+    if db.bind.dialect.name == "postgresql":
+        estimate = await db.scalar(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = :name"), {"name": table.name}
+        )
+    else:
+        estimate = await db.scalar(select(func.max(table.c.id)))
+    return max(int(estimate or 0), cap), False
+
+def set_page_headers(response, next_cursor, total=None):
+    """Expose the next cursor and, on first pages, the total count as response headers"""
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if total is not None:
+        count, exact = total
+        response.headers["X-Total-Count"] = str(count)
+        response.headers["X-Total-Count-Exact"] = "true" if exact else "false"
@@ -1,13 +1,225 @@
+import hashlib
 import os
+import threading
 from weasyprint import HTML, CSS
-from jinja2 import Template
+from weasyprint.text.fonts import FontConfiguration
+from jinja2 import BaseLoader, Environment, FileSystemBytecodeCache, TemplateNotFound
 from datetime import datetime
+from app.utils.asset_fetcher import AssetFetcher, get_assets_version, get_image_cache, preload_assets
+from app.utils.pdf_store import PDFStore
+from config import Config
+
+class TemplatePathLoader(BaseLoader):
+    """
+    Jinja2 loader that resolves templates by file path
+    
+    Letter templates are referenced by path (see LetterTemplate.template_path),
+    so the template name is the absolute path of the HTML file. The returned
+    uptodate check compares the file's mtime, which makes the environment
+    recompile a template as soon as it is edited on disk.
+    """
+    
+    def get_source(self, environment, template):
+        path = os.path.abspath(template)
+        try:
+            mtime = os.path.getmtime(path)
+            with open(path, 'r', encoding='utf-8') as file:
+                source = file.read()
+        except OSError:
+            raise TemplateNotFound(template)
+        
+        def uptodate():
+            try:
+                return os.path.getmtime(path) == mtime
+            except OSError:
+                return False
+        
+        return source, path, uptodate
+
+_template_env = None
+_template_env_lock = threading.Lock()
+
+def get_template_environment():
+    """
+    Get the process-wide Jinja2 environment used to render letter templates
+    
+    Compiled templates are kept in a bounded LRU cache (Config.TEMPLATE_CACHE_SIZE)
+    and reloaded when the template file changes. If Config.TEMPLATE_BYTECODE_CACHE_DIR
+    is set, compiled bytecode is also stored on disk so new worker processes
+    can skip compilation entirely.
+    """
+    global _template_env
+    if _template_env is None:
+        with _template_env_lock:
+            if _template_env is None:
+                bytecode_cache = None
+                if Config.TEMPLATE_BYTECODE_CACHE_DIR:
+                    os.makedirs(Config.TEMPLATE_BYTECODE_CACHE_DIR, exist_ok=True)
+                    bytecode_cache = FileSystemBytecodeCache(Config.TEMPLATE_BYTECODE_CACHE_DIR)
+                _template_env = Environment(
+                    loader=TemplatePathLoader(),
+                    cache_size=Config.TEMPLATE_CACHE_SIZE,
+                    auto_reload=True,
+                    bytecode_cache=bytecode_cache
+                )
+    return _template_env
+
+# Basic CSS applied to every letter for better formatting
+BASE_LETTER_CSS = """
+@page {
+    size: A4;
+    margin: 0.75in;
+}
+body {
+    font-family: Arial, sans-serif;
+    font-size: 12pt;
+    line-height: 1.4;
+    color: #333;
+}
+h1, h2, h3 {
+    color: #2c3e50;
+}
+.header {
+    text-align: center;
+    margin-bottom: 30px;
+}
+.letterhead {
+    height: 70px;
+}
+.content {
+    margin: 20px 0;
+}
+.signature {
+    margin-top: 50px;
+}
+"""
+
+BASE_LETTER_CSS_VERSION = hashlib.sha256(BASE_LETTER_CSS.encode('utf-8')).hexdigest()[:16]
+
+_font_config = None
+_stylesheet_cache = {}
+_stylesheet_stats = {"hits": 0, "misses": 0}
+_stylesheet_lock = threading.Lock()
+
+def get_font_configuration():
+    """Get the process-wide WeasyPrint font configuration"""
+    global _font_config
+    if _font_config is None:
+        with _stylesheet_lock:
+            if _font_config is None:
+                _font_config = FontConfiguration()
+    return _font_config
+
+def _get_cached_stylesheet(key, version, **css_kwargs):
+    """Return a parsed stylesheet for key, parsing it again only when version changes"""
+    with _stylesheet_lock:
+        cached = _stylesheet_cache.get(key)
+        if cached and cached[0] == version:
+            _stylesheet_stats["hits"] += 1
+            return cached[1]
+    
+    stylesheet = CSS(font_config=get_font_configuration(), url_fetcher=AssetFetcher(), **css_kwargs)
+    with _stylesheet_lock:
+        _stylesheet_stats["misses"] += 1
+        _stylesheet_cache[key] = (version, stylesheet)
+    return stylesheet
+
+def get_base_stylesheet():
+    """Get the parsed base letter stylesheet, parsed once per process"""
+    return _get_cached_stylesheet("base", None, string=BASE_LETTER_CSS)
+
+def get_template_stylesheet(html_template_path):
+    """
+    Get the parsed stylesheet override for a template, if any
+    
+    A template can ship its own styles as a .css file next to it
+    (e.g. app/templates/offer_letter.css). The parsed stylesheet is cached
+    and reparsed only when the file's mtime changes.
+    
+    Returns:
+        CSS object, or None if the template has no override
+    """
+    css_path = os.path.splitext(os.path.abspath(html_template_path))[0] + '.css'
+    try:
+        mtime = os.path.getmtime(css_path)
+    except OSError:
+        return None
+    return _get_cached_stylesheet(css_path, mtime, filename=css_path)
+
+def get_stylesheet_cache_stats():
+    """Get hit/miss counters and size of the stylesheet and template caches"""
+    with _stylesheet_lock:
+        stats = {
+            "stylesheets": len(_stylesheet_cache),
+            "hits": _stylesheet_stats["hits"],
+            "misses": _stylesheet_stats["misses"],
+            "font_config_loaded": _font_config is not None
+        }
+    if _template_env is not None:
+        stats["compiled_templates"] = len(_template_env.cache)
+    return stats
+
+def warm_caches(template_dir="app/templates"):
+    """
+    Pre-load the template, stylesheet and font caches
+    
+    Compiles every HTML template in template_dir, parses the base and
+    per-template stylesheets and reads the letter assets, so the first
+    letter rendered by a process does not pay for it.
+    """
+    env = get_template_environment()
+    get_base_stylesheet()
+    preload_assets()
+    if not os.path.isdir(template_dir):
+        return
+    for filename in sorted(os.listdir(template_dir)):
+        if filename.endswith('.html'):
+            template_path = os.path.join(template_dir, filename)
+            env.get_template(os.path.abspath(template_path))
+            get_template_stylesheet(template_path)
+
+def get_template_version(html_template_path):
+    """
+    Get a version string for a template and the stylesheets applied to it
+    
+    Changes whenever the template file, its stylesheet override, the base
+    letter stylesheet or a letter asset changes, so stored PDFs are never
+    reused across them.
+    """
+    css_path = os.path.splitext(os.path.abspath(html_template_path))[0] + '.css'
+    versions = [BASE_LETTER_CSS_VERSION, get_assets_version()]
+    for path in (html_template_path, css_path):
+        try:
+            versions.append(str(os.stat(path).st_mtime_ns))
+        except OSError:
+            versions.append('-')
+    return ':'.join(versions)
+
+class RenderedPDF:
+    """
+    Result of rendering a letter in memory
+    
+    pdf_path is the letter's location in the content-addressed store. If the
+    same letter was stored before, pdf_data is None and the file already
+    exists; otherwise pdf_data holds the PDF bytes, which still have to be
+    written with PDFStore.write_bytes() or write_bytes_async().
+    """
+    
+    def __init__(self, digest, pdf_path, pdf_data=None):
+        self.digest = digest
+        self.pdf_path = pdf_path
+        self.pdf_data = pdf_data
+    
+    @property
+    def stored(self):
+        return self.pdf_data is None
 
 class PDFGenerator:
     def __init__(self, output_dir="generated_letters"):
         self.output_dir = output_dir
         # Create output directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
+        self.store = PDFStore(output_dir)
     
     def generate_pdf(self, html_template_path, data, output_filename=None):
         """
@@ -16,64 +228,31 @@ class PDFGenerator:
         Args:
             html_template_path: Path to HTML template file
             data: Dictionary containing data to populate template
-            output_filename: Optional custom filename for output PDF
+            output_filename: Optional custom filename for output PDF. Without it
+                the PDF is kept in the content-addressed store and identical
+                letters share one file.
             
         Returns:
             Path to generated PDF file
         """
         try:
-            # Read HTML template
-            with open(html_template_path, 'r', encoding='utf-8') as file:
-                template_content = file.read()
-            
-            # Create Jinja2 template and render with data
-            template = Template(template_content)
-            rendered_html = template.render(**data)
-            
-            # Generate output filename if not provided
-            if not output_filename:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                letter_type = data.get('letter_type', 'letter')
-                user_id = data.get('user_id', 'unknown')
-                output_filename = f"{letter_type}_{user_id}_{timestamp}.pdf"
+            rendered_html = self._render_html(html_template_path, data)
             
-            # Ensure filename ends with .pdf
-            if not output_filename.endswith('.pdf'):
-                output_filename += '.pdf'
+            # Custom filenames bypass the content-addressed store
+            if output_filename:
+                if not output_filename.endswith('.pdf'):
+                    output_filename += '.pdf'
+                output_path = os.path.join(self.output_dir, output_filename)
+                self._write_pdf(rendered_html, html_template_path, output_path)
+                return output_path
             
-            output_path = os.path.join(self.output_dir, output_filename)
-            
-            # Add basic CSS for better formatting
-            css_style = """
-            @page {
-                size: A4;
-                margin: 0.75in;
-            }
-            body {
-                font-family: Arial, sans-serif;
-                font-size: 12pt;
-                line-height: 1.4;
-                color: #333;
-            }
-            h1, h2, h3 {
-                color: #2c3e50;
-            }
-            .header {
-                text-align: center;
-                margin-bottom: 30px;
-            }
-            .content {
-                margin: 20px 0;
-            }
-            .signature {
-                margin-top: 50px;
-            }
-            """
-            
-            # Generate PDF using weasyprint
-            html_doc = HTML(string=rendered_html)
-            css_doc = CSS(string=css_style)
-            html_doc.write_pdf(output_path, stylesheets=[css_doc])
+            # Reuse an identical letter rendered before instead of running weasyprint again
+            digest = PDFStore.compute_digest(get_template_version(html_template_path), rendered_html)
+            output_path = self.store.lookup(digest)
+            if output_path is None:
+                output_path = self.store.save(
+                    digest, lambda target: self._write_pdf(rendered_html, html_template_path, target)
+                )
             
             return output_path
             
@@ -81,6 +260,50 @@ class PDFGenerator:
             print(f"Error generating PDF: {e}")
             return None
     
+    def render_pdf(self, html_template_path, data):
+        """
+        Render PDF from HTML template and data in memory
+        
+        Nothing is written to disk, so the PDF can be handed straight to the
+        email pipeline and stored asynchronously. Unlike generate_pdf, errors
+        are raised to the caller.
+        
+        Args:
+            html_template_path: Path to HTML template file
+            data: Dictionary containing data to populate template
+            
+        Returns:
+            RenderedPDF for the letter
+        """
+        rendered_html = self._render_html(html_template_path, data)
+        digest = PDFStore.compute_digest(get_template_version(html_template_path), rendered_html)
+        
+        existing_path = self.store.lookup(digest)
+        if existing_path is not None:
+            return RenderedPDF(digest, existing_path)
+        
+        pdf_data = self._write_pdf(rendered_html, html_template_path)
+        return RenderedPDF(digest, self.store.path_for(digest), pdf_data)
+    
+    def _render_html(self, html_template_path, data):
+        # Load the compiled template from the shared environment and render with data
+        template = get_template_environment().get_template(os.path.abspath(html_template_path))
+        return template.render(**data)
+    
+    def _write_pdf(self, rendered_html, html_template_path, target=None):
+        """Run weasyprint with the shared stylesheets and fonts; returns the PDF bytes if target is None"""
+        stylesheets = [get_base_stylesheet()]
+        template_stylesheet = get_template_stylesheet(html_template_path)
+        if template_stylesheet is not None:
+            stylesheets.append(template_stylesheet)
+        # Relative URLs resolve against the template's directory; assets come from the cache
+        base_url = os.path.dirname(os.path.abspath(html_template_path)) + os.sep
+        html_doc = HTML(string=rendered_html, base_url=base_url, url_fetcher=AssetFetcher())
+        return html_doc.write_pdf(
+            target, stylesheets=stylesheets, font_config=get_font_configuration(),
+            cache=get_image_cache()
+        )
+    
     def generate_letter_pdf(self, letter_type, user_data, template_path=None):
         """
         Generate PDF for specific letter type
@@ -93,6 +316,25 @@ class PDFGenerator:
         Returns:
             Path to generated PDF file
         """
+        template_path = self._prepare_letter(letter_type, user_data, template_path)
+        return self.generate_pdf(template_path, user_data)
+    
+    def render_letter_pdf(self, letter_type, user_data, template_path=None):
+        """
+        Render PDF for specific letter type in memory
+        
+        Args:
+            letter_type: Type of letter (offer_letter, appointment_letter, etc.)
+            user_data: User data dictionary
+            template_path: Optional custom template path
+            
+        Returns:
+            RenderedPDF for the letter
+        """
+        template_path = self._prepare_letter(letter_type, user_data, template_path)
+        return self.render_pdf(template_path, user_data)
+    
+    def _prepare_letter(self, letter_type, user_data, template_path):
         if not template_path:
             template_path = f"app/templates/{letter_type}.html"
         
@@ -100,4 +342,9 @@ class PDFGenerator:
         user_data['current_date'] = datetime.now().strftime("%B %d, %Y")
         user_data['letter_type'] = letter_type
         
-        return self.generate_pdf(template_path, user_data)
+        return template_path
+    
+    @staticmethod
+    def cache_stats():
+        """Get statistics for the shared template and stylesheet caches"""
+        return get_stylesheet_cache_stats()
@@ -0,0 +1,202 @@
+# Content-addressed storage for generated letter PDFs
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import aiofiles
+import aiofiles.os
+from config import Config
+
+# Digests of PDFs outside the store, keyed by (path, mtime, size)
+_digest_cache = OrderedDict()
+_digest_cache_lock = threading.Lock()
+DIGEST_CACHE_SIZE = 1024
+
+class PDFStore:
+    """
+    Content-addressed store for rendered letter PDFs
+    
+    Every PDF is stored once as <digest>.pdf, where the digest is the SHA-256
+    of the template version and the fully rendered HTML. Regenerating an
+    identical letter therefore finds the existing file instead of rendering
+    it again, and several GeneratedLetter rows may share one pdf_path.
+    
+    A stored file is only removed by release() or sweep() once no
+    GeneratedLetter references it any more and it has not been used for
+    grace_seconds. Every store hit refreshes the file's modification time,
+    so a letter whose row is still being committed keeps its file.
+    """
+    
+    def __init__(self, root="generated_letters", grace_seconds=None):
+        self.root = root
+        self.grace_seconds = Config.PDF_STORE_GRACE_SECONDS if grace_seconds is None else grace_seconds
+        os.makedirs(root, exist_ok=True)
+    
+    @staticmethod
+    def compute_digest(template_version, rendered_html):
+        """Compute the content address for a rendered letter"""
+        sha = hashlib.sha256()
+        sha.update(template_version.encode('utf-8'))
+        sha.update(b'\0')
+        sha.update(rendered_html.encode('utf-8'))
+        return sha.hexdigest()
+    
+    def path_for(self, digest):
+        """Get the storage path for a digest"""
+        return os.path.join(self.root, f"{digest}.pdf")
+    
+    def lookup(self, digest):
+        """Return the path of the stored PDF for digest, or None if it is not stored"""
+        path = self.path_for(digest)
+        try:
+            # Marks the file as in use; fails if release() has just taken it away
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+    
+    def save(self, digest, write_func):
+        """
+        Store a PDF under digest
+        
+        The PDF is written to a temporary file in the store by write_func(path)
+        and then atomically moved into place, so concurrent writers of the same
+        letter never expose a partially written file.
+        
+        Returns:
+            Path to the stored PDF
+        """
+        path = self.path_for(digest)
+        tmp_path = self._temp_path(digest)
+        try:
+            write_func(tmp_path)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+    
+    def write_bytes(self, digest, data):
+        """Store PDF content that is already in memory"""
+        def write_func(path):
+            with open(path, 'wb') as file:
+                file.write(data)
+        return self.save(digest, write_func)
+    
+    async def write_bytes_async(self, digest, data):
+        """Store PDF content that is already in memory without blocking the event loop"""
+        path = self.path_for(digest)
+        tmp_path = self._temp_path(digest)
+        try:
+            async with aiofiles.open(tmp_path, 'wb') as file:
+                await file.write(data)
+            await aiofiles.os.replace(tmp_path, path)
+        except Exception:
+            if await aiofiles.os.path.exists(tmp_path):
+                await aiofiles.os.remove(tmp_path)
+            raise
+        return path
+    
+    def _temp_path(self, digest):
+        return os.path.join(self.root, f".{digest}.{uuid.uuid4().hex}.tmp")
+    
+    def is_stored(self, pdf_path):
+        """Check whether pdf_path is a content-addressed file of this store"""
+        if not pdf_path:
+            return False
+        name = os.path.basename(pdf_path)
+        digest = name[:-4] if name.endswith('.pdf') else ''
+        return (
+            len(digest) == 64
+            and all(c in '0123456789abcdef' for c in digest)
+            and os.path.abspath(os.path.dirname(pdf_path)) == os.path.abspath(self.root)
+        )
+    
+    def content_digest(self, pdf_path):
+        """
+        Get the SHA-256 digest identifying a PDF's content
+        
+        Stored PDFs carry their digest in the filename. For other files
+        (e.g. letters generated before the store existed) the content is hashed
+        in chunks and the result cached until the file changes.
+        """
+        if self.is_stored(pdf_path):
+            return os.path.basename(pdf_path)[:-4]
+        
+        stat_result = os.stat(pdf_path)
+        key = (os.path.abspath(pdf_path), stat_result.st_mtime_ns, stat_result.st_size)
+        with _digest_cache_lock:
+            digest = _digest_cache.get(key)
+            if digest is not None:
+                _digest_cache.move_to_end(key)
+                return digest
+        
+        sha = hashlib.sha256()
+        with open(pdf_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(64 * 1024), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        
+        with _digest_cache_lock:
+            _digest_cache[key] = digest
+            if len(_digest_cache) > DIGEST_CACHE_SIZE:
+                _digest_cache.popitem(last=False)
+        return digest
+    
+    def reference_count(self, db, pdf_path):
+        """Count GeneratedLetter rows pointing at pdf_path"""
+        from app.models.letter import GeneratedLetter
+        return db.query(GeneratedLetter).filter(GeneratedLetter.pdf_path == pdf_path).count()
+    
+    def release(self, db, pdf_path):
+        """
+        Drop a reference to a stored PDF
+        
+        Call after the referencing GeneratedLetter has been deleted and
+        committed. The file is removed only if no other letter uses it and
+        it has not been stored or looked up within grace_seconds; otherwise
+        it is left for sweep().
+        
+        The file is first moved aside, so later lookups miss it, and then
+        checked again: a lookup that got in before the move has refreshed its
+        modification time, and the file is put back for that letter.
+        
+        Returns:
+            True if the file was removed
+        """
+        if not self.is_stored(pdf_path) or self.reference_count(db, pdf_path) > 0:
+            return False
+        
+        digest = os.path.basename(pdf_path)[:-4]
+        released_path = self._temp_path(digest)
+        try:
+            os.replace(pdf_path, released_path)
+        except FileNotFoundError:
+            return False
+        
+        if time.time() - os.stat(released_path).st_mtime < self.grace_seconds:
+            os.replace(released_path, pdf_path)
+            return False
+        os.remove(released_path)
+        return True
+    
+    def sweep(self, db):
+        """
+        Remove stored PDFs that no letter references, once unused for grace_seconds
+        
+        Picks up files release() had to keep because they were in recent use.
+        
+        Returns:
+            Number of files removed
+        """
+        from app.models.letter import GeneratedLetter
+        referenced = {path for (path,) in db.query(GeneratedLetter.pdf_path).distinct()}
+        removed = 0
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if path not in referenced and self.is_stored(path) and self.release(db, path):
+                removed += 1
+        return removed
@@ -0,0 +1,74 @@
+# Streaming ZIP archive builder
+import zipfile
+
+class _ZipStreamBuffer:
+    """
+    Write-only file object that collects zipfile output until it is drained
+    
+    It has no seek(), so zipfile writes entries with data descriptors and
+    never needs to go back and patch headers.
+    """
+    
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+    
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self._position
+    
+    def flush(self):
+        pass
+    
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def stream_zip(entries, chunk_size=64 * 1024, compression=zipfile.ZIP_DEFLATED):
+    """
+    Build a ZIP archive on the fly and yield it in chunks
+    
+    Files are read chunk_size bytes at a time and their compressed output is
+    yielded as soon as it is produced, so memory use stays constant no matter
+    how many files are archived and no temporary archive is written.
+    
+    Args:
+        entries: Iterable of (archive_name, file_path) pairs; files that
+            cannot be opened are skipped
+        chunk_size: Number of bytes read from each file at a time
+        compression: zipfile compression method
+        
+    Yields:
+        Bytes of the archive
+    """
+    buffer = _ZipStreamBuffer()
+    with zipfile.ZipFile(buffer, mode='w', compression=compression) as archive:
+        for archive_name, file_path in entries:
+            try:
+                # Nothing is left open if either step fails
+                zip_info = zipfile.ZipInfo.from_file(file_path, archive_name)
+                source = open(file_path, 'rb')
+            except OSError:
+                continue
+            
+            zip_info.compress_type = compression
+            with source, archive.open(zip_info, mode='w') as target:
+                for chunk in iter(lambda: source.read(chunk_size), b''):
+                    target.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            
+            data = buffer.drain()
+            if data:
+                yield data
+    
+    # Central directory written when the archive is closed
+    data = buffer.drain()
+    if data:
+        yield data
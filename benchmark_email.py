@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+End-to-end email throughput harness
+Starts a local SMTP sink (smtp_sink.py) and pushes letters through the email
+path against it, so the pipeline can be load-tested without Gmail.
+
+Modes:
+    direct  EmailService.send_letter_notification on a thread pool (pooled smtplib sessions)
+    outbox  Queue every letter in the email outbox and let EmailDispatcher deliver it
+            (asyncio SMTP engine, retries with backoff, rate limits)
+
+Reports messages/second, connection reuse ratio, retry counts and latency
+percentiles (send_letter_notification call time in direct mode, enqueue to
+delivery in outbox mode).
+
+Usage:
+    python benchmark_email.py
+    python benchmark_email.py --letters 1000 --concurrency 8 --latency-ms 20 --failure-rate 0.02
+    python benchmark_email.py --modes outbox --output email_bench.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from smtp_sink import SMTPSink
+
+MODES = ["direct", "outbox"]
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def summarise(mode, args, wall, latencies, sent, failed, retries, reuse_ratio, sink_stats):
+    return {
+        "mode": mode,
+        "letters": args.letters,
+        "concurrency": args.concurrency,
+        "attachment_kb": args.attachment_kb,
+        "sink_latency_ms": args.latency_ms,
+        "sink_failure_rate": args.failure_rate,
+        "wall_s": round(wall, 3),
+        "messages_per_sec": round(sent / wall, 2) if wall else 0.0,
+        "sent": sent,
+        "failed": failed,
+        "retries": retries,
+        "connection_reuse_ratio": reuse_ratio,
+        "sink_connections": sink_stats["connections"],
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies, default=0) * 1000, 2)
+    }
+
+def run_direct(args, pdf_data):
+    """Send every letter with EmailService.send_letter_notification, retrying failures like the outbox"""
+    from app.services.email_service import EmailService
+    from send_mail import get_smtp_pool
+    
+    email_service = EmailService()
+    latencies = []
+    counts = {"sent": 0, "failed": 0, "retries": 0}
+    lock = threading.Lock()
+    
+    def count(key):
+        with lock:
+            counts[key] += 1
+    
+    def send(index):
+        for attempt in range(args.max_attempts):
+            if attempt:
+                count("retries")
+            start = time.perf_counter()
+            success = email_service.send_letter_notification(
+                f"employee{index}@example.com", "offer_letter", None, pdf_data
+            )
+            latencies.append(time.perf_counter() - start)
+            if success:
+                count("sent")
+                return
+        count("failed")
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(send, range(args.letters)))
+    wall = time.perf_counter() - start
+    return wall, latencies, counts["sent"], counts["failed"], counts["retries"], get_smtp_pool().stats()["reuse_ratio"]
+
+def run_outbox(args, pdf_path):
+    """Queue every letter in the outbox and wait for the dispatcher to finish them"""
+    from app.database import SessionLocal
+    from app.models.email_outbox import EmailOutbox
+    from app.services.email_outbox import EmailDispatcher, enqueue_email
+    from app.services.email_service import EmailService
+    from app.services.rate_limiter import SendRateScheduler
+    from send_mail import get_async_smtp_engine, close_async_smtp_engine
+    
+    subject, body = EmailService.build_letter_notification("offer_letter")
+    db = SessionLocal()
+    try:
+        db.query(EmailOutbox).delete()
+        for index in range(args.letters):
+            enqueue_email(db, f"employee{index}@example.com", subject, body, pdf_path, "offer_letter.pdf")
+        db.commit()
+    finally:
+        db.close()
+    
+    dispatcher = EmailDispatcher(
+        workers=args.concurrency,
+        max_attempts=args.max_attempts,
+        retry_base=0.05,
+        retry_max=1,
+        poll_interval=0.05,
+        scheduler=SendRateScheduler(0, 0, 0, {})
+    )
+    
+    async def drain():
+        start = time.perf_counter()
+        await dispatcher.start()
+        while True:
+            stats = dispatcher.stats()
+            if stats["sent"] + stats["dead"] >= args.letters:
+                break
+            await asyncio.sleep(0.05)
+        wall = time.perf_counter() - start
+        reuse_ratio = get_async_smtp_engine().stats()["reuse_ratio"]
+        await dispatcher.stop()
+        await close_async_smtp_engine()
+        return wall, stats, reuse_ratio
+    
+    wall, stats, reuse_ratio = asyncio.run(drain())
+    
+    db = SessionLocal()
+    try:
+        rows = db.query(EmailOutbox.created_at, EmailOutbox.sent_at).filter(EmailOutbox.status == "sent").all()
+    finally:
+        db.close()
+    latencies = [(sent_at - created_at).total_seconds() for created_at, sent_at in rows]
+    return wall, latencies, stats["sent"], stats["dead"], stats["retried"], reuse_ratio
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the email path against a local SMTP sink")
+    parser.add_argument("--modes", default=",".join(MODES), help="Comma-separated modes: direct,outbox")
+    parser.add_argument("--letters", type=int, default=200, help="Number of letters to send per mode")
+    parser.add_argument("--concurrency", type=int, default=4, help="Sending threads (direct) or workers (outbox)")
+    parser.add_argument("--attachment-kb", type=int, default=60, help="Size of the synthetic PDF attachment")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Sink delay before accepting each message")
+    parser.add_argument("--failure-rate", type=float, default=0, help="Fraction of messages the sink rejects")
+    parser.add_argument("--max-attempts", type=int, default=5, help="Attempts per letter before giving up")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show per-message output from the email path")
+    args = parser.parse_args()
+    
+    sink = SMTPSink(port=0, latency=args.latency_ms / 1000.0, failure_rate=args.failure_rate).start()
+    workdir = tempfile.mkdtemp(prefix="email_bench_")
+    
+    # Point the app at the sink and a scratch database before it reads its configuration
+    os.environ.update({
+        "SMTP_SERVER": sink.host,
+        "SMTP_PORT": str(sink.port),
+        "SMTP_USE_TLS": "false",
+        "SMTP_POOL_SIZE": str(args.concurrency),
+        "SMTP_MAX_CONCURRENT_SESSIONS": str(args.concurrency),
+        "SENDER_EMAIL": "hr@example.com",
+        "SENDER_PASSWORD": "sink",
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "EMAIL_LOG_FLUSH_INTERVAL": "0"
+    })
+    from app.init_db import create_tables
+    create_tables()
+    
+    pdf_data = b"%PDF-1.7\n" + os.urandom(args.attachment_kb * 1024)
+    pdf_path = os.path.join(workdir, "letter.pdf")
+    with open(pdf_path, "wb") as file:
+        file.write(pdf_data)
+    
+    print("📊 Email Throughput Benchmark")
+    print("=" * 50)
+    
+    results = []
+    try:
+        for mode in [m for m in args.modes.split(",") if m]:
+            before = dict(sink.stats)
+            # The email path prints a line per message; keep the report readable
+            quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+            with quiet:
+                if mode == "direct":
+                    outcome = run_direct(args, pdf_data)
+                else:
+                    outcome = run_outbox(args, pdf_path)
+            sink_stats = {key: sink.stats[key] - before[key] for key in sink.stats}
+            result = summarise(mode, args, *outcome, sink_stats)
+            results.append(result)
+            print(f"  {mode:<7} n={args.letters:<5} c={args.concurrency:<3} "
+                  f"{result['messages_per_sec']:>8.1f} msg/s  reuse={result['connection_reuse_ratio']:.2f}  "
+                  f"retries={result['retries']:<4} failed={result['failed']:<4} "
+                  f"p50={result['p50_ms']:>7.1f}ms p99={result['p99_ms']:>7.1f}ms")
+    finally:
+        sink.stop()
+    
+    report = {"sink": sink.stats, "results": results}
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"\n📁 Results written to {args.output}")
+    else:
+        print("\n" + json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for letter rendering
+Drives PDFGenerator and LetterGenerator across all letter templates with
+synthetic user data, serially and on thread and process pools, and reports
+latency percentiles, throughput and peak RSS.
+
+Usage:
+    python benchmark_rendering.py
+    python benchmark_rendering.py --batch-sizes 20,100 --workers 1,2,4 --output bench.json
+    python benchmark_rendering.py --compare bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.letter_generator import LetterGenerator
+from app.services.render_engine import RenderEngine
+from app.utils.pdf_generator import PDFGenerator
+
+LETTER_TYPES = ["offer_letter", "appointment_letter", "confirmation_letter", "relieving_letter"]
+MODES = ["serial", "thread", "process"]
+
+_generators = {}
+
+def make_user_data(index, paragraphs=1):
+    """Build synthetic data covering the fields used by every template"""
+    filler = " ".join(
+        f"Clause {n + 1}: the employee agrees to the policies in section {n + 1} of the handbook."
+        for n in range(paragraphs)
+    )
+    return {
+        'user_id': index,
+        'full_name': f"Employee {index}",
+        'name': f"Employee {index}",
+        'username': f"employee{index}",
+        'email': f"employee{index}@example.com",
+        'employee_id': f"BENCH{index:06d}",
+        'department': ["Engineering", "Marketing", "Finance", "HR"][index % 4],
+        'designation': "Associate",
+        'position': "Associate",
+        'joining_date': "January 15, 2024",
+        'start_date': "January 15, 2024",
+        'manager': "Jane Manager",
+        'reporting_manager': "Jane Manager",
+        'salary': f"{500000 + index}",
+        'terms': filler,
+        'confirmation_date': "July 15, 2024",
+        'performance_notes': filler,
+        'last_working_day': "December 31, 2025",
+        'experience_duration': "2 years"
+    }
+
+def _render_job(letter_type, user_data, output_dir):
+    """Render one letter in memory; runs in the caller, a thread or a worker process"""
+    generator = _generators.get(output_dir)
+    if generator is None:
+        generator = _generators[output_dir] = LetterGenerator()
+        generator.pdf_generator = PDFGenerator(output_dir)
+    start = time.perf_counter()
+    rendered = generator.render_letter(letter_type, user_data)
+    return time.perf_counter() - start, len(rendered.pdf_data or b"")
+
+class RSSSampler:
+    """Samples resident memory of this process and its children in the background"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def _rss(self, pid):
+        try:
+            with open(f"/proc/{pid}/statm") as file:
+                return int(file.read().split()[1]) * self._page_size
+        except (OSError, ValueError, IndexError):
+            return 0
+
+    def sample(self):
+        if os.path.exists("/proc/self/statm"):
+            total = self._rss("self") + sum(self._rss(child.pid) for child in multiprocessing.active_children())
+        else:
+            # ru_maxrss is in KB on Linux and bytes on macOS
+            usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            total = usage if sys.platform == "darwin" else usage * 1024
+        self.peak = max(self.peak, total)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def run_serial(jobs, output_dir, workers):
+    latencies = []
+    for letter_type, user_data in jobs:
+        start = time.perf_counter()
+        _render_job(letter_type, user_data, output_dir)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def run_thread(jobs, output_dir, workers):
+    latencies = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for letter_type, user_data in jobs:
+            start = time.perf_counter()
+            future = executor.submit(_render_job, letter_type, user_data, output_dir)
+            future.add_done_callback(lambda _, start=start: latencies.append(time.perf_counter() - start))
+    return latencies
+
+def run_process(jobs, output_dir, workers, engine):
+    async def render_all():
+        async def render(letter_type, user_data):
+            start = time.perf_counter()
+            await engine.run(_render_job, letter_type, user_data, output_dir)
+            return time.perf_counter() - start
+        return await asyncio.gather(*[render(letter_type, user_data) for letter_type, user_data in jobs])
+    return list(asyncio.run(render_all()))
+
+def run_benchmark(letter_type, mode, workers, batch_size, paragraphs, output_dir, engine=None):
+    """Render batch_size letters of one type in one mode and summarise the run"""
+    # Unique data per letter so the content-addressed store never short-circuits a render
+    offset = int(time.time() * 1000) % 10**9
+    jobs = [(letter_type, make_user_data(offset + i, paragraphs)) for i in range(batch_size)]
+
+    with RSSSampler() as sampler:
+        start = time.perf_counter()
+        if mode == "serial":
+            latencies = run_serial(jobs, output_dir, workers)
+        elif mode == "thread":
+            latencies = run_thread(jobs, output_dir, workers)
+        else:
+            latencies = run_process(jobs, output_dir, workers, engine)
+        wall = time.perf_counter() - start
+
+    return {
+        "template": letter_type,
+        "mode": mode,
+        "workers": 1 if mode == "serial" else workers,
+        "batch_size": batch_size,
+        "paragraphs": paragraphs,
+        "wall_s": round(wall, 4),
+        "letters_per_sec": round(batch_size / wall, 2) if wall else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "peak_rss_mb": round(sampler.peak / (1024 * 1024), 1)
+    }
+
+def environment_info():
+    """Describe the machine and commit the results were produced on"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        commit = None
+    try:
+        import weasyprint
+        weasyprint_version = weasyprint.__version__
+    except Exception:
+        weasyprint_version = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "weasyprint": weasyprint_version
+    }
+
+def compare(results, baseline_path):
+    """Print throughput and p95 changes against a previous JSON report"""
+    with open(baseline_path) as file:
+        baseline = json.load(file)
+    key = lambda r: (r["template"], r["mode"], r["workers"], r["batch_size"], r["paragraphs"])
+    previous = {key(r): r for r in baseline["results"]}
+
+    print(f"\nComparison with {baseline_path} (commit {baseline['environment'].get('commit')}):")
+    for result in results:
+        before = previous.get(key(result))
+        if not before:
+            continue
+        throughput = (result["letters_per_sec"] / before["letters_per_sec"] - 1) * 100 if before["letters_per_sec"] else 0
+        p95 = (result["p95_ms"] / before["p95_ms"] - 1) * 100 if before["p95_ms"] else 0
+        print(f"  {result['template']:<20} {result['mode']:<8} w={result['workers']:<2} n={result['batch_size']:<5} "
+              f"throughput {throughput:+6.1f}%  p95 {p95:+6.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark letter rendering")
+    parser.add_argument("--templates", default=",".join(LETTER_TYPES), help="Comma-separated letter types")
+    parser.add_argument("--modes", default=",".join(MODES), help="Comma-separated modes: serial,thread,process")
+    parser.add_argument("--batch-sizes", default="20", help="Comma-separated number of letters per run")
+    parser.add_argument("--workers", default="2,4", help="Comma-separated pool sizes for thread/process modes")
+    parser.add_argument("--paragraphs", default="1", help="Comma-separated filler paragraph counts (template complexity)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Compare against a previous JSON report")
+    args = parser.parse_args()
+
+    templates = [t for t in args.templates.split(",") if t]
+    modes = [m for m in args.modes.split(",") if m]
+    batch_sizes = [int(n) for n in args.batch_sizes.split(",")]
+    worker_counts = [int(n) for n in args.workers.split(",")]
+    paragraph_counts = [int(n) for n in args.paragraphs.split(",")]
+
+    print("📊 Letter Rendering Benchmark")
+    print("=" * 50)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="letter_bench_") as output_dir:
+        # Warm up this process so the first serial run does not pay for compilation
+        _render_job(templates[0], make_user_data(0), output_dir)
+
+        for mode in modes:
+            for workers in ([1] if mode == "serial" else worker_counts):
+                engine = None
+                if mode == "process":
+                    engine = RenderEngine(max_workers=workers, max_queue=max(batch_sizes + [workers]))
+                    engine.start()
+                    # Wait for every worker to start and warm up before measuring
+                    run_process([(templates[0], make_user_data(-n - 1)) for n in range(workers)],
+                                output_dir, workers, engine)
+                try:
+                    for letter_type in templates:
+                        for paragraphs in paragraph_counts:
+                            for batch_size in batch_sizes:
+                                result = run_benchmark(letter_type, mode, workers, batch_size,
+                                                       paragraphs, output_dir, engine)
+                                results.append(result)
+                                print(f"  {letter_type:<20} {mode:<8} w={result['workers']:<2} n={batch_size:<5} "
+                                      f"p50={result['p50_ms']:>8.1f}ms p95={result['p95_ms']:>8.1f}ms "
+                                      f"p99={result['p99_ms']:>8.1f}ms {result['letters_per_sec']:>7.1f}/s "
+                                      f"rss={result['peak_rss_mb']:>7.1f}MB")
+                finally:
+                    if engine is not None:
+                        engine.shutdown()
+
+    report = {"environment": environment_info(), "results": results}
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"\n📁 Results written to {args.output}")
+    else:
+        print("\n" + json.dumps(report, indent=2))
+
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -12,3 +12,43 @@ class Config:
     EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD", "")
     FILE_UPLOAD_PATH = os.getenv("FILE_UPLOAD_PATH", "uploads/")
     MAX_FILE_SIZE = os.getenv("MAX_FILE_SIZE", "10MB")
+    TEMPLATE_CACHE_SIZE = int(os.getenv("TEMPLATE_CACHE_SIZE", 50))
+    TEMPLATE_BYTECODE_CACHE_DIR = os.getenv("TEMPLATE_BYTECODE_CACHE_DIR", "")
+    RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", 2))
+    RENDER_MAX_QUEUE = int(os.getenv("RENDER_MAX_QUEUE", 32))
+    RENDER_START_METHOD = os.getenv("RENDER_START_METHOD", "spawn")
+    BATCH_INSERT_SIZE = int(os.getenv("BATCH_INSERT_SIZE", 50))
+    LETTER_LOGO_PATH = os.getenv("LETTER_LOGO_PATH", "logo/IILM_University_Gurgaon_logo.jpg")
+    ASSET_CACHE_MAX_BYTES = int(os.getenv("ASSET_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+    SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
+    SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", 4))
+    SMTP_MAX_IDLE_SECONDS = int(os.getenv("SMTP_MAX_IDLE_SECONDS", 60))
+    SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", 100))
+    EMAIL_WORKERS = int(os.getenv("EMAIL_WORKERS", 8))
+    EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", 5))
+    EMAIL_RETRY_BASE_SECONDS = int(os.getenv("EMAIL_RETRY_BASE_SECONDS", 30))
+    EMAIL_RETRY_MAX_SECONDS = int(os.getenv("EMAIL_RETRY_MAX_SECONDS", 3600))
+    EMAIL_POLL_INTERVAL = float(os.getenv("EMAIL_POLL_INTERVAL", 5))
+    SMTP_MAX_CONCURRENT_SESSIONS = int(os.getenv("SMTP_MAX_CONCURRENT_SESSIONS", 20))
+    EMAIL_RATE_PER_MINUTE = float(os.getenv("EMAIL_RATE_PER_MINUTE", 60))
+    EMAIL_RATE_PER_DAY = float(os.getenv("EMAIL_RATE_PER_DAY", 2000))
+    EMAIL_DOMAIN_RATE_PER_MINUTE = float(os.getenv("EMAIL_DOMAIN_RATE_PER_MINUTE", 30))
+    EMAIL_DOMAIN_RATE_LIMITS = os.getenv("EMAIL_DOMAIN_RATE_LIMITS", "")
+    EMAIL_LOG_BATCH_SIZE = int(os.getenv("EMAIL_LOG_BATCH_SIZE", 100))
+    EMAIL_LOG_FLUSH_INTERVAL = float(os.getenv("EMAIL_LOG_FLUSH_INTERVAL", 2))
+    ATTACHMENT_CACHE_MAX_BYTES = int(os.getenv("ATTACHMENT_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+    CAMPAIGN_CHUNK_SIZE = int(os.getenv("CAMPAIGN_CHUNK_SIZE", 100))
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", 65536))
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 268435456))
+    PAGINATION_COUNT_CAP = int(os.getenv("PAGINATION_COUNT_CAP", 10000))
+    STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", 10))
+    USER_IMPORT_BATCH_SIZE = int(os.getenv("USER_IMPORT_BATCH_SIZE", 500))
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    PDF_STORE_GRACE_SECONDS = int(os.getenv("PDF_STORE_GRACE_SECONDS", 600))
@@ -85,4 +85,13 @@ export const adminAPI = {
     api.get('/admin/stats'),
 };
 
+// Letters API
+export const lettersAPI = {
+  getLetter: (letterId: number) =>
+    api.get(`/letters/${letterId}`),
+  
+  downloadLetterPdf: (letterId: number) =>
+    api.get(`/letters/${letterId}/pdf`, { responseType: 'blob' }),
+};
+
 export default api;
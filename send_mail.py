@@ -1,11 +1,746 @@
+import asyncio
+import base64
+import hashlib
 import smtplib
+import socket
+import ssl
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from email.header import Header
 from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.application import MIMEApplication
+from email.policy import SMTP as SMTP_POLICY
+from email.utils import encode_rfc2231, formatdate, make_msgid
 import os
+import aiofiles
 from dotenv import load_dotenv
+from config import Config
 
-def send_email(sender_email, sender_password, recipient_email, subject, body, attachment_path=None):
+# Raw bytes per base64 block; a multiple of 57 so every encoded line is 76 characters
+ATTACHMENT_ENCODE_BLOCK = 57 * 1024
+
+def encode_attachment(data):
+    """
+    Base64-encode attachment data as CRLF-terminated MIME lines
+    
+    Encodes block by block into a single buffer, so only one encoded copy of
+    the attachment ever exists in memory.
+    
+    Args:
+        data: Attachment content (bytes, bytearray or memoryview)
+    """
+    view = memoryview(data)
+    encoded = bytearray()
+    for start in range(0, len(view), ATTACHMENT_ENCODE_BLOCK):
+        encoded += base64.encodebytes(view[start:start + ATTACHMENT_ENCODE_BLOCK]).replace(b'\n', b'\r\n')
+    return encoded
+
+class AttachmentCache:
+    """
+    LRU cache of base64-encoded attachments, capped in bytes
+    
+    Encoded attachments are keyed by the SHA-256 of their content, so every
+    message carrying the same PDF reuses one encoded copy. Attachments read
+    from disk are additionally indexed by (path, inode, size), which lets
+    repeat sends of a stored letter skip reading and hashing the file. The
+    modification time is left out because the PDF store touches a file on
+    every hit; the store replaces files rather than rewriting them, so new
+    content always comes with a new inode.
+    """
+    
+    def __init__(self, max_bytes=None):
+        self.max_bytes = Config.ATTACHMENT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self._entries = OrderedDict()
+        self._paths = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+    
+    @staticmethod
+    def _path_key(path):
+        stat = os.stat(path)
+        return (os.path.realpath(path), stat.st_dev, stat.st_ino, stat.st_size)
+    
+    def _get(self, digest):
+        encoded = self._entries.get(digest)
+        if encoded is not None:
+            self._entries.move_to_end(digest)
+            self._stats["hits"] += 1
+        return encoded
+    
+    def _put(self, digest, encoded):
+        if len(encoded) > self.max_bytes:
+            return
+        self._entries[digest] = encoded
+        self._size += len(encoded)
+        while self._size > self.max_bytes:
+            evicted, old = self._entries.popitem(last=False)
+            self._size -= len(old)
+            self._stats["evictions"] += 1
+            self._paths = {key: value for key, value in self._paths.items() if value != evicted}
+    
+    def encode(self, data, path_key=None):
+        """Get the encoded form of attachment data, encoding it only on a cache miss"""
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            encoded = self._get(digest)
+            if encoded is not None:
+                if path_key:
+                    self._paths[path_key] = digest
+                return encoded
+            self._stats["misses"] += 1
+        
+        # Kept as the encoder's own buffer; copying it to bytes would briefly double the memory
+        encoded = encode_attachment(data)
+        with self._lock:
+            if digest not in self._entries:
+                self._put(digest, encoded)
+            if path_key and digest in self._entries:
+                self._paths[path_key] = digest
+        return encoded
+    
+    def lookup_path(self, path):
+        """Get the encoded form of a file already seen unchanged, or None"""
+        try:
+            path_key = self._path_key(path)
+        except OSError:
+            return None
+        with self._lock:
+            digest = self._paths.get(path_key)
+            return self._get(digest) if digest else None
+    
+    def encode_file(self, path, data=None):
+        """Get the encoded form of a file, reading it unless data holds its content"""
+        encoded = self.lookup_path(path)
+        if encoded is not None:
+            return encoded
+        path_key = self._path_key(path)
+        if data is None:
+            with open(path, 'rb') as file:
+                data = file.read()
+        return self.encode(data, path_key)
+    
+    def stats(self):
+        """Get hit, miss and eviction counts and the cache size"""
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries), "bytes": self._size,
+                    "max_bytes": self.max_bytes}
+
+_attachment_cache = None
+
+def get_attachment_cache():
+    """Get the process-wide encoded attachment cache"""
+    global _attachment_cache
+    if _attachment_cache is None:
+        _attachment_cache = AttachmentCache()
+    return _attachment_cache
+
+def _encode_header(value):
+    # Long values are folded; continuation lines must end in CRLF like every other line sent as DATA
+    return Header(value, 'us-ascii' if value.isascii() else 'utf-8').encode(linesep='\r\n')
+
+def build_attachment_header(boundary, attachment_name):
+    """Build the MIME headers that open a PDF attachment part"""
+    if attachment_name.isascii() and '"' not in attachment_name:
+        filename = f'filename="{attachment_name}"'
+    else:
+        filename = f"filename*={encode_rfc2231(attachment_name, 'utf-8')}"
+    return (
+        f"--{boundary}\r\n"
+        "Content-Type: application/pdf\r\n"
+        "Content-Transfer-Encoding: base64\r\n"
+        f"Content-Disposition: attachment; {filename}\r\n"
+        "\r\n"
+    ).encode('utf-8')
+
+def build_message_parts(sender_email, recipient_email, subject, body, attachment_data=None,
+                        attachment_name=None, encoded_attachment=None):
+    """
+    Build a multipart email as a list of byte chunks
+    
+    The attachment is base64-encoded once and kept as its own chunk instead of
+    being copied into a flattened message string. Every line is a header,
+    a boundary or base64 text, so no line starts with '.' and the chunks can
+    be sent as SMTP DATA without dot-stuffing.
+    
+    The encoded attachment comes from the attachment cache unless the caller
+    passes it in as encoded_attachment.
+    
+    Returns:
+        List of bytes-like chunks making up the message
+    """
+    boundary = f"=={uuid.uuid4().hex}=="
+    text_part = MIMEText(body, 'plain', 'utf-8')
+    
+    parts = [
+        (
+            f"From: {sender_email}\r\n"
+            f"To: {recipient_email}\r\n"
+            f"Subject: {_encode_header(subject)}\r\n"
+            f"Date: {formatdate(localtime=True)}\r\n"
+            f"Message-ID: {make_msgid()}\r\n"
+            "MIME-Version: 1.0\r\n"
+            f'Content-Type: multipart/mixed; boundary="{boundary}"\r\n'
+            "\r\n"
+            f"--{boundary}\r\n"
+        ).encode('utf-8'),
+        text_part.as_bytes(policy=SMTP_POLICY)
+    ]
+    
+    if encoded_attachment is None and attachment_data is not None:
+        encoded_attachment = get_attachment_cache().encode(attachment_data)
+    if encoded_attachment is not None:
+        parts.append(build_attachment_header(boundary, attachment_name or "attachment.pdf"))
+        parts.append(encoded_attachment)
+    
+    parts.append(f"--{boundary}--\r\n".encode('utf-8'))
+    return parts
+
+def session_lost(error):
+    """
+    True if an SMTP error leaves the session unusable
+    
+    That is a dropped connection, a socket error or a 421 reply (the server
+    is closing the channel). Any other rejection only concerns the message,
+    and the session can be kept once it accepts RSET.
+    """
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code == 421
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+class SMTPDataInterrupted(smtplib.SMTPServerDisconnected):
+    """
+    Raised when the connection is lost once DATA has been sent
+    
+    The server may already have accepted the message, so unlike other
+    disconnects the send must not be retried on the spot.
+    """
+
+def send_message_parts(server, sender_email, recipient_email, parts):
+    """
+    Send a message built by build_message_parts over an open SMTP session
+    
+    Writes the chunks straight to the socket after DATA rather than joining
+    them into one buffer first.
+    """
+    server.ehlo_or_helo_if_needed()
+    code, response = server.mail(sender_email)
+    if code != 250:
+        server.rset()
+        raise smtplib.SMTPSenderRefused(code, response, sender_email)
+    code, response = server.rcpt(recipient_email)
+    if code not in (250, 251):
+        server.rset()
+        raise smtplib.SMTPRecipientsRefused({recipient_email: (code, response)})
+    
+    try:
+        code, response = server.docmd("data")
+        if code != 354:
+            server.rset()
+            raise smtplib.SMTPDataError(code, response)
+        
+        for part in parts:
+            server.send(part)
+        server.send(b".\r\n")
+        
+        code, response = server.getreply()
+    except smtplib.SMTPServerDisconnected as e:
+        raise SMTPDataInterrupted(str(e)) from e
+    if code != 250:
+        raise smtplib.SMTPDataError(code, response)
+
+class SMTPConnectionPool:
+    """
+    Pool of authenticated SMTP sessions reused across messages
+    
+    Opening a session costs a TCP handshake, STARTTLS and LOGIN, so sessions
+    are kept open and handed out again for later messages with the same
+    credentials. At most max_size sessions per sender are open at once;
+    further callers wait for one to be returned.
+    
+    Sessions idle for longer than health_check_after seconds are probed with
+    NOOP before reuse, and sessions idle for longer than max_idle seconds,
+    or that have sent max_messages messages, are closed and replaced. A
+    session that fails with a connection error is discarded, never returned
+    to the pool.
+    """
+    
+    def __init__(self, host=None, port=None, use_tls=None, max_size=None, max_idle=None,
+                 max_messages=None, health_check_after=5, timeout=30):
+        self.host = host or Config.SMTP_SERVER
+        self.port = port or Config.SMTP_PORT
+        self.use_tls = Config.SMTP_USE_TLS if use_tls is None else use_tls
+        self.max_size = max_size or Config.SMTP_POOL_SIZE
+        self.max_idle = Config.SMTP_MAX_IDLE_SECONDS if max_idle is None else max_idle
+        self.max_messages = max_messages or Config.SMTP_MAX_MESSAGES_PER_CONNECTION
+        self.health_check_after = health_check_after
+        self.timeout = timeout
+        self._idle = {}
+        self._slots = {}
+        self._lock = threading.Lock()
+        self._stats = {"created": 0, "reused": 0, "discarded": 0, "messages": 0}
+    
+    def _connect(self, username, password):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            server.ehlo()
+            if self.use_tls:
+                server.starttls()
+                server.ehlo()
+            if password:
+                server.login(username, password)
+        except Exception:
+            self._close(server)
+            raise
+        with self._lock:
+            self._stats["created"] += 1
+        return {"server": server, "messages": 0, "last_used": time.monotonic()}
+    
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+    
+    def _is_usable(self, session):
+        idle = time.monotonic() - session["last_used"]
+        if idle > self.max_idle or session["messages"] >= self.max_messages:
+            return False
+        if idle > self.health_check_after:
+            try:
+                return session["server"].noop()[0] == 250
+            except Exception:
+                return False
+        return True
+    
+    def _acquire(self, key, username, password):
+        with self._lock:
+            slots = self._slots.setdefault(key, threading.BoundedSemaphore(self.max_size))
+        slots.acquire()
+        try:
+            while True:
+                with self._lock:
+                    idle = self._idle.get(key)
+                    session = idle.pop() if idle else None
+                if session is None:
+                    return self._connect(username, password)
+                if self._is_usable(session):
+                    with self._lock:
+                        self._stats["reused"] += 1
+                    return session
+                self._discard(session)
+        except Exception:
+            slots.release()
+            raise
+    
+    def _release(self, key, session):
+        session["last_used"] = time.monotonic()
+        with self._lock:
+            self._idle.setdefault(key, []).append(session)
+        self._slots[key].release()
+    
+    def _discard(self, session, key=None):
+        self._close(session["server"])
+        with self._lock:
+            self._stats["discarded"] += 1
+        if key is not None:
+            self._slots[key].release()
+    
+    @contextmanager
+    def connection(self, username, password):
+        """
+        Check out an authenticated SMTP session
+        
+        Usage:
+            with pool.connection(sender_email, sender_password) as server:
+                send_message_parts(server, ...)
+        """
+        key = (username, password)
+        session = self._acquire(key, username, password)
+        try:
+            yield session["server"]
+        except (smtplib.SMTPServerDisconnected, smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused,
+                OSError) as e:
+            # Keep the session only if the server rejected the message but the connection is fine
+            if session_lost(e) or not self._reset(session):
+                self._discard(session, key)
+            else:
+                self._release(key, session)
+            raise
+        except Exception:
+            self._discard(session, key)
+            raise
+        else:
+            session["messages"] += 1
+            with self._lock:
+                self._stats["messages"] += 1
+            self._release(key, session)
+    
+    @staticmethod
+    def _reset(session):
+        try:
+            return session["server"].rset()[0] == 250
+        except Exception:
+            return False
+    
+    def stats(self):
+        """Get connection counters; reuse_ratio is the share of checkouts served by an open session"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["idle"] = sum(len(sessions) for sessions in self._idle.values())
+        checkouts = stats["created"] + stats["reused"]
+        stats["reuse_ratio"] = round(stats["reused"] / checkouts, 3) if checkouts else 0.0
+        return stats
+    
+    def close_all(self):
+        """Close every idle session"""
+        with self._lock:
+            sessions = [session for idle in self._idle.values() for session in idle]
+            self._idle = {}
+        for session in sessions:
+            self._close(session["server"])
+
+_smtp_pool = None
+_smtp_pool_lock = threading.Lock()
+
+def get_smtp_pool():
+    """Get the process-wide SMTP connection pool"""
+    global _smtp_pool
+    if _smtp_pool is None:
+        with _smtp_pool_lock:
+            if _smtp_pool is None:
+                _smtp_pool = SMTPConnectionPool()
+    return _smtp_pool
+
+def close_smtp_pool():
+    """Close the process-wide SMTP connection pool's idle sessions"""
+    if _smtp_pool is not None:
+        _smtp_pool.close_all()
+
+class AsyncSMTPConnection:
+    """
+    Minimal SMTP client on asyncio streams
+    
+    Speaks just enough SMTP for this application (EHLO, STARTTLS, AUTH PLAIN,
+    MAIL/RCPT/DATA, RSET, NOOP, QUIT) without blocking the event loop.
+    Errors are raised as the matching smtplib exceptions so callers can
+    handle both sending paths the same way.
+    """
+    
+    def __init__(self, host, port, timeout=30):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.extensions = {}
+        self._reader = None
+        self._writer = None
+    
+    async def connect(self, use_tls=True, username=None, password=None):
+        """Open the connection, upgrade to TLS if requested and log in"""
+        try:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.timeout
+            )
+        except asyncio.TimeoutError:
+            raise smtplib.SMTPConnectError(-1, f"Timed out connecting to {self.host}:{self.port}")
+        code, response = await self._read_reply()
+        if code != 220:
+            await self.close()
+            raise smtplib.SMTPConnectError(code, response)
+        await self.ehlo()
+        if use_tls:
+            if "starttls" not in self.extensions:
+                raise smtplib.SMTPNotSupportedError("STARTTLS extension not supported by server.")
+            code, response = await self.command("STARTTLS")
+            if code != 220:
+                raise smtplib.SMTPResponseException(code, response)
+            await self._writer.start_tls(ssl.create_default_context(), server_hostname=self.host)
+            await self.ehlo()
+        if password:
+            await self.login(username, password)
+    
+    async def ehlo(self):
+        code, response = await self.command(f"EHLO {socket.getfqdn()}")
+        if code != 250:
+            raise smtplib.SMTPHeloError(code, response)
+        self.extensions = {}
+        for line in response.decode('latin-1').splitlines()[1:]:
+            keyword, _, params = line.partition(' ')
+            self.extensions[keyword.lower()] = params
+    
+    async def login(self, username, password):
+        if "auth" not in self.extensions:
+            raise smtplib.SMTPNotSupportedError("SMTP AUTH extension not supported by server.")
+        token = base64.b64encode(f"\0{username}\0{password}".encode('utf-8')).decode('ascii')
+        code, response = await self.command(f"AUTH PLAIN {token}")
+        if code not in (235, 503):
+            raise smtplib.SMTPAuthenticationError(code, response)
+    
+    async def command(self, line):
+        """Send one command line and return its (code, response) reply"""
+        self._write(f"{line}\r\n".encode('utf-8'))
+        await self._drain()
+        return await self._read_reply()
+    
+    def _write(self, data):
+        if self._writer is None or self._writer.is_closing():
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        self._writer.write(data)
+    
+    async def _drain(self):
+        try:
+            await asyncio.wait_for(self._writer.drain(), self.timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            await self.close()
+            raise smtplib.SMTPServerDisconnected(f"Connection lost: {e}")
+    
+    async def _read_reply(self):
+        lines = []
+        while True:
+            try:
+                line = await asyncio.wait_for(self._reader.readline(), self.timeout)
+            except (OSError, asyncio.TimeoutError) as e:
+                await self.close()
+                raise smtplib.SMTPServerDisconnected(f"Connection lost: {e}")
+            if not line:
+                await self.close()
+                raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+            lines.append(line[4:].rstrip(b"\r\n"))
+            if line[3:4] != b"-":
+                break
+        try:
+            code = int(line[:3])
+        except ValueError:
+            code = -1
+        return code, b"\n".join(lines)
+    
+    async def send_message_parts(self, sender_email, recipient_email, parts):
+        """Async counterpart of send_message_parts; chunks are written as they are"""
+        code, response = await self.command(f"MAIL FROM:<{sender_email}>")
+        if code != 250:
+            await self.rset()
+            raise smtplib.SMTPSenderRefused(code, response, sender_email)
+        code, response = await self.command(f"RCPT TO:<{recipient_email}>")
+        if code not in (250, 251):
+            await self.rset()
+            raise smtplib.SMTPRecipientsRefused({recipient_email: (code, response)})
+        
+        try:
+            code, response = await self.command("DATA")
+            if code != 354:
+                await self.rset()
+                raise smtplib.SMTPDataError(code, response)
+            
+            for part in parts:
+                self._write(part)
+                await self._drain()
+            self._write(b".\r\n")
+            await self._drain()
+            
+            code, response = await self._read_reply()
+        except smtplib.SMTPServerDisconnected as e:
+            raise SMTPDataInterrupted(str(e)) from e
+        if code != 250:
+            raise smtplib.SMTPDataError(code, response)
+    
+    async def noop(self):
+        return (await self.command("NOOP"))[0]
+    
+    async def rset(self):
+        return (await self.command("RSET"))[0]
+    
+    async def quit(self):
+        try:
+            await self.command("QUIT")
+        except Exception:
+            pass
+        await self.close()
+    
+    async def close(self):
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+class AsyncSMTPEngine:
+    """
+    Asyncio sending engine with a bounded number of concurrent SMTP sessions
+    
+    Each send holds one of max_sessions slots for the length of the SMTP
+    transaction, so a single event loop can keep many deliveries in flight
+    without a thread per message while never opening more than max_sessions
+    connections. Finished sessions are kept open per sender and reused under
+    the same idle and message limits as SMTPConnectionPool.
+    """
+    
+    def __init__(self, host=None, port=None, use_tls=None, max_sessions=None, max_idle=None,
+                 max_messages=None, health_check_after=5, timeout=30):
+        self.host = host or Config.SMTP_SERVER
+        self.port = port or Config.SMTP_PORT
+        self.use_tls = Config.SMTP_USE_TLS if use_tls is None else use_tls
+        self.max_sessions = max_sessions or Config.SMTP_MAX_CONCURRENT_SESSIONS
+        self.max_idle = Config.SMTP_MAX_IDLE_SECONDS if max_idle is None else max_idle
+        self.max_messages = max_messages or Config.SMTP_MAX_MESSAGES_PER_CONNECTION
+        self.health_check_after = health_check_after
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(self.max_sessions)
+        self._idle = {}
+        self._in_flight = 0
+        self._stats = {"created": 0, "reused": 0, "discarded": 0, "messages": 0}
+    
+    async def _checkout(self, username, password):
+        idle = self._idle.get((username, password))
+        while idle:
+            session = idle.pop()
+            age = time.monotonic() - session["last_used"]
+            usable = age <= self.max_idle and session["messages"] < self.max_messages
+            if usable and age > self.health_check_after:
+                try:
+                    usable = await session["connection"].noop() == 250
+                except Exception:
+                    usable = False
+            if usable:
+                self._stats["reused"] += 1
+                return session
+            await self._discard(session)
+        
+        connection = AsyncSMTPConnection(self.host, self.port, self.timeout)
+        try:
+            await connection.connect(self.use_tls, username, password)
+        except Exception:
+            await connection.close()
+            raise
+        self._stats["created"] += 1
+        return {"connection": connection, "messages": 0, "last_used": time.monotonic()}
+    
+    async def _discard(self, session):
+        self._stats["discarded"] += 1
+        await session["connection"].quit()
+    
+    async def send(self, sender_email, sender_password, recipient_email, parts):
+        """
+        Send a message built by build_message_parts, waiting for a free session slot
+        
+        Raises the smtplib exception of a failed send. A session dropped by
+        the server before DATA is retried once on a fresh connection.
+        """
+        key = (sender_email, sender_password)
+        async with self._slots:
+            self._in_flight += 1
+            try:
+                for attempt in range(2):
+                    session = await self._checkout(sender_email, sender_password)
+                    try:
+                        await session["connection"].send_message_parts(sender_email, recipient_email, parts)
+                    except smtplib.SMTPServerDisconnected as e:
+                        await self._discard(session)
+                        # Only a session lost before DATA is retried; after it the message may have been accepted
+                        if attempt or isinstance(e, SMTPDataInterrupted):
+                            raise
+                        continue
+                    except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused) as e:
+                        # The server rejected the message; keep the session if it accepts RSET
+                        if not session_lost(e) and await self._reset(session):
+                            self._release(key, session)
+                        else:
+                            await self._discard(session)
+                        raise
+                    except BaseException:
+                        await self._discard(session)
+                        raise
+                    session["messages"] += 1
+                    self._stats["messages"] += 1
+                    self._release(key, session)
+                    return
+            finally:
+                self._in_flight -= 1
+    
+    @staticmethod
+    async def _reset(session):
+        try:
+            return await session["connection"].rset() == 250
+        except Exception:
+            return False
+    
+    def _release(self, key, session):
+        session["last_used"] = time.monotonic()
+        self._idle.setdefault(key, []).append(session)
+    
+    def stats(self):
+        """Get connection counters, sessions in flight and reuse_ratio"""
+        stats = dict(self._stats)
+        stats["in_flight"] = self._in_flight
+        stats["idle"] = sum(len(sessions) for sessions in self._idle.values())
+        checkouts = stats["created"] + stats["reused"]
+        stats["reuse_ratio"] = round(stats["reused"] / checkouts, 3) if checkouts else 0.0
+        return stats
+    
+    async def close(self):
+        """Close every idle session"""
+        sessions = [session for idle in self._idle.values() for session in idle]
+        self._idle = {}
+        await asyncio.gather(*[session["connection"].quit() for session in sessions])
+
+_async_smtp_engine = None
+
+def get_async_smtp_engine():
+    """Get the process-wide asyncio SMTP engine; only use it from one event loop"""
+    global _async_smtp_engine
+    if _async_smtp_engine is None:
+        _async_smtp_engine = AsyncSMTPEngine()
+    return _async_smtp_engine
+
+async def close_async_smtp_engine():
+    """Close the process-wide asyncio SMTP engine, if it was created"""
+    global _async_smtp_engine
+    if _async_smtp_engine is not None:
+        await _async_smtp_engine.close()
+        _async_smtp_engine = None
+
+def deliver_email(sender_email, sender_password, recipient_email, subject, body, attachment_path=None,
+                  attachment_name=None, attachment_data=None):
+    """
+    Send email with optional PDF attachment, raising on failure
+    
+    Takes the same arguments as send_email. Raises the smtplib or OSError
+    exception from the failed send so callers can decide whether to retry.
+    """
+    encoded_attachment = None
+    if attachment_data is None and attachment_path:
+        encoded_attachment = get_attachment_cache().encode_file(attachment_path)
+        if not attachment_name:
+            attachment_name = os.path.basename(attachment_path)
+    
+    parts = build_message_parts(sender_email, recipient_email, subject, body,
+                                attachment_data, attachment_name, encoded_attachment)
+    
+    pool = get_smtp_pool()
+    for attempt in range(2):
+        try:
+            with pool.connection(sender_email, sender_password) as server:
+                send_message_parts(server, sender_email, recipient_email, parts)
+            return
+        except SMTPDataInterrupted:
+            # The server may have accepted the message; sending it again could deliver it twice
+            raise
+        except smtplib.SMTPServerDisconnected:
+            # A pooled session went away between uses; retry once on a fresh one
+            if attempt:
+                raise
+
+def send_email(sender_email, sender_password, recipient_email, subject, body, attachment_path=None,
+               attachment_name=None, attachment_data=None):
     """
     Send email with optional PDF attachment
     
@@ -16,45 +751,30 @@ def send_email(sender_email, sender_password, recipient_email, subject, body, at
         subject: Email subject
         body: Email body text
         attachment_path: Optional path to PDF file to attach
+        attachment_name: Optional filename shown for the attachment
+            (defaults to the file's basename)
+        attachment_data: Optional PDF content already in memory (bytes or
+            memoryview); used instead of reading attachment_path
     """
-    msg = MIMEMultipart()
-    msg['From'] = sender_email
-    msg['To'] = recipient_email
-    msg['Subject'] = subject
-    msg.attach(MIMEText(body, 'plain'))
-
-    # Add PDF attachment if provided
-    if attachment_path and os.path.exists(attachment_path):
-        with open(attachment_path, 'rb') as file:
-            attach = MIMEApplication(file.read(), _subtype='pdf')
-            attach.add_header('Content-Disposition', 'attachment', 
-                            filename=os.path.basename(attachment_path))
-            msg.attach(attach)
-
+    # Send without the attachment if its file is missing
+    if attachment_data is None and attachment_path and not os.path.exists(attachment_path):
+        attachment_path = None
+    
     try:
-        with smtplib.SMTP('smtp.gmail.com', 587) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.sendmail(sender_email, recipient_email, msg.as_string())
+        deliver_email(sender_email, sender_password, recipient_email, subject, body, attachment_path,
+                      attachment_name, attachment_data)
         print('Email sent successfully!')
         return True
     except Exception as e:
         print(f'Failed to send email: {e}')
         return False
 
-def send_user_credentials_email(sender_email, sender_password, recipient_email, 
-                               username, password, full_name, letter_pdf_path=None):
+def build_user_credentials_email(username, password, full_name):
     """
-    Send user credentials and welcome letter via email
+    Build the subject and body of the new-user credentials email
     
-    Args:
-        sender_email: Admin's email address
-        sender_password: Admin's email password
-        recipient_email: New user's email address
-        username: New user's username
-        password: New user's password (plain text)
-        full_name: New user's full name
-        letter_pdf_path: Optional path to generated letter PDF
+    Returns:
+        Tuple of (subject, body)
     """
     subject = "Welcome to the Organization - Your Account Details"
     
@@ -74,8 +794,85 @@ If you have any questions or need assistance, please don't hesitate to contact t
 
 Best regards,
 HR Team"""
+    
+    return subject, body
+
+def send_user_credentials_email(sender_email, sender_password, recipient_email, 
+                               username, password, full_name, letter_pdf_path=None,
+                               attachment_name=None, letter_pdf_data=None):
+    """
+    Send user credentials and welcome letter via email
+    
+    Args:
+        sender_email: Admin's email address
+        sender_password: Admin's email password
+        recipient_email: New user's email address
+        username: New user's username
+        password: New user's password (plain text)
+        full_name: New user's full name
+        letter_pdf_path: Optional path to generated letter PDF
+        attachment_name: Optional filename shown for the letter attachment
+        letter_pdf_data: Optional letter PDF content already in memory
+    """
+    subject, body = build_user_credentials_email(username, password, full_name)
 
-    return send_email(sender_email, sender_password, recipient_email, subject, body, letter_pdf_path)
+    return send_email(sender_email, sender_password, recipient_email, subject, body, letter_pdf_path,
+                      attachment_name, letter_pdf_data)
+
+async def deliver_email_async(sender_email, sender_password, recipient_email, subject, body,
+                              attachment_path=None, attachment_name=None, attachment_data=None):
+    """
+    Send email on the asyncio SMTP engine, raising on failure
+    
+    Takes the same arguments as send_email.
+    """
+    # Hashing and base64 of a cache miss run in a thread so large attachments never block the loop
+    cache = get_attachment_cache()
+    encoded_attachment = None
+    if attachment_data is not None:
+        encoded_attachment = await asyncio.to_thread(cache.encode, attachment_data)
+    elif attachment_path:
+        encoded_attachment = cache.lookup_path(attachment_path)
+        if encoded_attachment is None:
+            async with aiofiles.open(attachment_path, 'rb') as file:
+                data = await file.read()
+            encoded_attachment = await asyncio.to_thread(cache.encode_file, attachment_path, data)
+        if not attachment_name:
+            attachment_name = os.path.basename(attachment_path)
+    
+    parts = build_message_parts(sender_email, recipient_email, subject, body,
+                                attachment_data, attachment_name, encoded_attachment)
+    await get_async_smtp_engine().send(sender_email, sender_password, recipient_email, parts)
+
+async def send_email_async(sender_email, sender_password, recipient_email, subject, body,
+                           attachment_path=None, attachment_name=None, attachment_data=None):
+    """
+    Send email with optional PDF attachment without blocking the event loop
+    
+    Takes the same arguments as send_email and returns True on success,
+    False on failure.
+    """
+    # Send without the attachment if its file is missing
+    if attachment_data is None and attachment_path and not os.path.exists(attachment_path):
+        attachment_path = None
+    
+    try:
+        await deliver_email_async(sender_email, sender_password, recipient_email, subject, body,
+                                  attachment_path, attachment_name, attachment_data)
+        print('Email sent successfully!')
+        return True
+    except Exception as e:
+        print(f'Failed to send email: {e}')
+        return False
+
+async def send_user_credentials_email_async(sender_email, sender_password, recipient_email,
+                                            username, password, full_name, letter_pdf_path=None,
+                                            attachment_name=None, letter_pdf_data=None):
+    """Send user credentials and welcome letter without blocking the event loop"""
+    subject, body = build_user_credentials_email(username, password, full_name)
+    
+    return await send_email_async(sender_email, sender_password, recipient_email, subject, body,
+                                  letter_pdf_path, attachment_name, letter_pdf_data)
 
 if __name__ == "__main__":
     load_dotenv()
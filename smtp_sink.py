@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Local SMTP sink for testing the email path without a real mail provider
+Accepts and counts every message, optionally storing each one as an .eml
+file, and can inject reply latency and temporary or permanent failures.
+Any AUTH credentials are accepted and STARTTLS is not offered, so point the
+app at it with SMTP_USE_TLS=false.
+
+Usage:
+    python smtp_sink.py --port 8025
+    python smtp_sink.py --port 8025 --latency-ms 50 --failure-rate 0.05 --store-dir sink_mail
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import threading
+import time
+
+class SMTPSink:
+    """
+    Minimal asyncio SMTP server that accepts mail into memory or a directory
+    
+    Args:
+        host: Interface to listen on
+        port: Port to listen on (0 picks a free port; see .port after start)
+        latency: Seconds to wait before answering the end of DATA
+        failure_rate: Fraction of messages rejected at the end of DATA
+        failure_code: Reply code for rejected messages (451 temporary, 550 permanent)
+        store_dir: Optional directory every accepted message is written to
+    """
+    
+    def __init__(self, host="127.0.0.1", port=8025, latency=0.0, failure_rate=0.0, failure_code=451,
+                 store_dir=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.failure_code = failure_code
+        self.store_dir = store_dir
+        self.stats = {"connections": 0, "messages": 0, "rejected": 0, "bytes": 0}
+        self._server = None
+        self._loop = None
+        self._thread = None
+    
+    async def _reply(self, writer, line):
+        writer.write(f"{line}\r\n".encode("ascii"))
+        await writer.drain()
+    
+    async def _handle(self, reader, writer):
+        self.stats["connections"] += 1
+        try:
+            await self._reply(writer, "220 localhost SMTP sink ready")
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode("latin-1").strip()
+                verb = command.split(" ", 1)[0].upper()
+                
+                if verb in ("EHLO", "HELO"):
+                    writer.write(b"250-localhost\r\n250-8BITMIME\r\n250 AUTH PLAIN LOGIN\r\n")
+                    await writer.drain()
+                elif verb == "AUTH":
+                    await self._reply(writer, "235 2.7.0 Authentication successful")
+                elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                    await self._reply(writer, "250 OK")
+                elif verb == "DATA":
+                    await self._reply(writer, "354 End data with <CR><LF>.<CR><LF>")
+                    await self._receive(reader, writer)
+                elif verb == "QUIT":
+                    await self._reply(writer, "221 Bye")
+                    break
+                else:
+                    await self._reply(writer, "502 Command not implemented")
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # Client went away, or the sink is stopping
+            pass
+        finally:
+            writer.close()
+    
+    async def _receive(self, reader, writer):
+        lines = []
+        while True:
+            line = await reader.readline()
+            if not line or line == b".\r\n":
+                break
+            lines.append(line[1:] if line.startswith(b"..") else line)
+        
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        
+        if self.failure_rate and random.random() < self.failure_rate:
+            self.stats["rejected"] += 1
+            await self._reply(writer, f"{self.failure_code} Injected failure")
+            return
+        
+        data = b"".join(lines)
+        self.stats["messages"] += 1
+        self.stats["bytes"] += len(data)
+        if self.store_dir:
+            path = os.path.join(self.store_dir, f"{time.time_ns()}_{self.stats['messages']}.eml")
+            with open(path, "wb") as file:
+                file.write(data)
+        await self._reply(writer, "250 OK: queued")
+    
+    async def listen(self):
+        """Open the listening socket"""
+        if self.store_dir:
+            os.makedirs(self.store_dir, exist_ok=True)
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+    
+    async def serve(self):
+        """Listen and serve until cancelled"""
+        if self._server is None:
+            await self.listen()
+        async with self._server:
+            await self._server.serve_forever()
+    
+    def start(self):
+        """Run the sink on a background thread; returns once it is listening"""
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self.listen())
+        
+        def run():
+            asyncio.set_event_loop(self._loop)
+            try:
+                self._loop.run_until_complete(self.serve())
+            except asyncio.CancelledError:
+                pass
+        
+        self._thread = threading.Thread(target=run, name="smtp-sink", daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        """Stop a sink started with start()"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._cancel_all)
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+    
+    def _cancel_all(self):
+        for task in asyncio.all_tasks(self._loop):
+            task.cancel()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local SMTP sink")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay before accepting each message")
+    parser.add_argument("--failure-rate", type=float, default=0, help="Fraction of messages to reject")
+    parser.add_argument("--failure-code", type=int, default=451, help="Reply code for rejected messages")
+    parser.add_argument("--store-dir", help="Write accepted messages to this directory")
+    args = parser.parse_args()
+    
+    sink = SMTPSink(args.host, args.port, args.latency_ms / 1000.0, args.failure_rate, args.failure_code,
+                    args.store_dir)
+    print(f"📨 SMTP sink listening on {args.host}:{args.port} (Ctrl+C to stop)")
+    try:
+        asyncio.run(sink.serve())
+    except KeyboardInterrupt:
+        pass
+    print(f"\n{sink.stats}")
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,8 @@ from dotenv import load_dotenv
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from send_mail import send_email, send_user_credentials_email
+import re
+from send_mail import build_message_parts, send_email, send_user_credentials_email
 
 def test_basic_email():
     """Test basic email sending without attachment"""
@@ -122,6 +123,23 @@ Test System"""
         print("❌ Email with attachment test failed!")
         return False
 
+def test_message_lines_end_in_crlf():
+    """Test that built messages have no bare LF, including folded long subjects"""
+    subjects = [
+        "Offer Letter - " + "Senior Software Engineer, Platform Infrastructure " * 3,
+        "Lettre d'offre - Ingénieur logiciel principal, équipe plateforme " * 3
+    ]
+    for subject in subjects:
+        parts = build_message_parts("hr@example.com", "new.hire@example.com", subject, "Welcome aboard.",
+                                    b"%PDF-1.4 test", "offer_letter.pdf")
+        header_block = bytes(parts[0])
+        assert b"\r\n " in header_block, "long subject was not folded"
+        for part in parts:
+            assert not re.search(rb"(?<!\r)\n", bytes(part)), f"bare LF in message part: {bytes(part)[:80]!r}"
+    
+    print("✅ Message line ending test passed!")
+    return True
+
 def main():
     """Run all email tests"""
     print("🧪 Starting Email Functionality Tests")
@@ -130,7 +148,8 @@ def main():
     tests = [
         ("Basic Email", test_basic_email),
         ("User Credentials Email", test_credentials_email),
-        ("Email with Attachment", test_email_with_attachment)
+        ("Email with Attachment", test_email_with_attachment),
+        ("Message Line Endings", test_message_lines_end_in_crlf)
     ]
     
     passed = 0
@@ -0,0 +1,113 @@
+# Test that hot-path queries are served by indexes instead of full table scans
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.database import create_database_engine
+from app.migrations import run_migrations
+from app.models import User, GeneratedLetter, EmailLog, EmailOutbox
+from app.utils.pagination import apply_keyset, _sort_keys
+from app.utils.json_fields import json_field
+from app.services.campaign_runner import campaign_user_query
+
+# A scratch SQLite database of our own, so the application's database is never migrated
+engine = create_database_engine("sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="query_plans_"), "plans.db"))
+
+# Tables that grow with every letter or email; a plain SCAN of one is a full scan
+LARGE_TABLES = {"generated_letters", "email_logs", "email_outbox"}
+SEEN = datetime(2026, 1, 1)
+
+def letter_page(*filters, after=None):
+    """Select the letter listing page the admin route runs, as built by the pagination helpers"""
+    keys = _sort_keys([GeneratedLetter.generated_at, GeneratedLetter.id], "sqlite")
+    query = select(GeneratedLetter).where(*filters)
+    return apply_keyset(query, keys, after, descending=True).limit(101)
+
+def hot_queries():
+    """Name and statement of each query on a request or worker hot path"""
+    db = Session(bind=engine)
+    try:
+        campaign = campaign_user_query(db, "offer_letter", {}).filter(User.id > 0).order_by(User.id).limit(100)
+        campaign_statement = campaign.statement
+    finally:
+        db.close()
+    
+    return [
+        ("letter listing", letter_page(), True),
+        ("letter listing, next page", letter_page(after=["2026-01-01 00:00:00", 1000]), True),
+        ("letters of a type", letter_page(GeneratedLetter.letter_type == "offer_letter"), True),
+        ("letters by status", letter_page(GeneratedLetter.status == "generated"), True),
+        ("letters of an employee", letter_page(GeneratedLetter.user_id == 1), True),
+        ("letters by position", letter_page(json_field(GeneratedLetter.letter_data, "position") == "Engineer"), False),
+        ("letters by salary range",
+         letter_page(json_field(GeneratedLetter.letter_data, "salary", numeric=True) >= 90000), False),
+        ("letters by department and start date", letter_page(
+            json_field(GeneratedLetter.letter_data, "department") == "Engineering",
+            json_field(GeneratedLetter.letter_data, "start_date") >= "2026-01-01"
+        ), False),
+        ("dashboard recent letters",
+         select(GeneratedLetter).order_by(GeneratedLetter.generated_at.desc()).limit(5), True),
+        ("email history of a letter",
+         select(EmailLog).where(EmailLog.letter_id == 1).order_by(EmailLog.sent_at), True),
+        ("outbox claim",
+         select(EmailOutbox.id).where(
+             EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= SEEN
+         ).order_by(EmailOutbox.next_attempt_at, EmailOutbox.id).limit(8), False),
+        ("campaign chunk", campaign_statement, False),
+        ("letters generated since", select(func.count()).select_from(GeneratedLetter).where(
+            GeneratedLetter.generated_at >= SEEN), False)
+    ]
+
+def query_plan(statement):
+    """Run EXPLAIN QUERY PLAN for a statement and return the plan detail lines"""
+    compiled = statement.compile(engine, compile_kwargs={"literal_binds": True})
+    with engine.connect() as connection:
+        return [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}")]
+
+def plan_problems(plan, ordered):
+    """List full scans of large tables, and sorts that an index should have provided"""
+    problems = []
+    for detail in plan:
+        match = re.match(r"SCAN (\w+)", detail)
+        if match and match.group(1) in LARGE_TABLES and "INDEX" not in detail:
+            problems.append(f"full table scan: {detail}")
+        if ordered and "TEMP B-TREE" in detail:
+            problems.append(f"sort without an index: {detail}")
+    return problems
+
+def test_hot_queries_use_indexes():
+    """Fail if any hot-path query falls back to a full table scan"""
+    run_migrations(bind=engine)
+    failures = []
+    for name, statement, ordered in hot_queries():
+        problems = plan_problems(query_plan(statement), ordered)
+        if problems:
+            failures.append(f"{name}: {'; '.join(problems)}")
+    assert not failures, "\n".join(failures)
+
+def test_migrations_are_idempotent():
+    """A second run applies nothing and keeps the indexes in place"""
+    run_migrations(bind=engine)
+    assert run_migrations(bind=engine) == []
+    with engine.connect() as connection:
+        indexes = {row[1] for row in connection.exec_driver_sql("PRAGMA index_list(generated_letters)")}
+    assert "ix_generated_letters_user_id_generated_at" in indexes
+
+if __name__ == "__main__":
+    print("🔍 Checking query plans of hot-path queries...")
+    run_migrations(bind=engine)
+    for name, statement, ordered in hot_queries():
+        plan = query_plan(statement)
+        problems = plan_problems(plan, ordered)
+        print(f"{'❌' if problems else '✅'} {name}")
+        for detail in plan:
+            print(f"     {detail}")
+    test_hot_queries_use_indexes()
+    test_migrations_are_idempotent()
+    print("All hot-path queries use indexes!")